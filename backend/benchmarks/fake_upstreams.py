@@ -0,0 +1,201 @@
+"""Local stand-ins for OpenWeather and Ollama, for benchmarking without the real services.
+
+Run from the backend directory:
+
+    python -m benchmarks.fake_upstreams --port 9000 --latency-ms 80 --error-rate 0.01
+
+then start the app against it:
+
+    OPENWEATHER_BASE_URL=http://127.0.0.1:9000 OLLAMA_HOST=http://127.0.0.1:9000 \\
+    OPENWEATHER_API_KEY=fake uvicorn main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+# Tunables, set from the command line (see main())
+config = {
+    "latency_ms": 50.0,        # mean OpenWeather latency
+    "jitter_ms": 20.0,         # +/- uniform jitter
+    "error_rate": 0.0,         # fraction of OpenWeather calls answered with 500
+    "llm_latency_ms": 1500.0,  # total Ollama generation time
+    "llm_chunks": 30,          # streamed chunks per generation
+}
+
+FAKE_ANSWER = json.dumps({
+    "packing_list": [
+        "Light jacket",
+        "Comfortable walking shoes",
+        "Reusable water bottle",
+        "Sunscreen",
+        "Compact umbrella"
+    ],
+    "travel_tips": [
+        "Check the morning forecast before heading out",
+        "Carry a mask if air quality drops",
+        "Stay hydrated during long walks"
+    ]
+})
+
+
+def _seeded(city: str) -> random.Random:
+    """Deterministic per-city randomness so repeated calls agree."""
+    return random.Random(int(hashlib.md5(city.lower().encode()).hexdigest()[:8], 16))
+
+
+async def _upstream_delay():
+    delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+    await asyncio.sleep(max(delay, 0) / 1000)
+
+
+def _should_fail() -> bool:
+    return random.random() < config["error_rate"]
+
+
+def _coords_from_query(request: Request):
+    params = request.query_params
+    if "lat" in params and "lon" in params:
+        return float(params["lat"]), float(params["lon"])
+    rng = _seeded(params.get("q", ""))
+    return rng.uniform(-60, 60), rng.uniform(-180, 180)
+
+
+@app.get("/geo/1.0/direct")
+async def geocode(q: str, request: Request):
+    await _upstream_delay()
+    if _should_fail():
+        return JSONResponse({"cod": 500, "message": "Internal error"}, status_code=500)
+    if q.lower().startswith("unknown"):
+        return []
+    lat, lon = _coords_from_query(request)
+    return [{"name": q, "lat": lat, "lon": lon, "country": "XX"}]
+
+
+@app.get("/data/2.5/weather")
+async def weather(request: Request):
+    await _upstream_delay()
+    if _should_fail():
+        return JSONResponse({"cod": 500, "message": "Internal error"}, status_code=500)
+    lat, lon = _coords_from_query(request)
+    rng = _seeded(f"{lat:.2f},{lon:.2f}")
+    temp = round(rng.uniform(-10, 38), 1)
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [{"main": "Clouds", "description": "scattered clouds"}],
+        "main": {"temp": temp, "feels_like": temp - 1, "humidity": rng.randint(20, 95)},
+        "wind": {"speed": round(rng.uniform(0, 12), 1)},
+    }
+
+
+@app.get("/data/2.5/air_pollution")
+async def air_pollution(request: Request):
+    await _upstream_delay()
+    if _should_fail():
+        return JSONResponse({"cod": 500, "message": "Internal error"}, status_code=500)
+    lat, lon = _coords_from_query(request)
+    rng = _seeded(f"aqi:{lat:.2f},{lon:.2f}")
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "list": [{
+            "main": {"aqi": rng.randint(1, 5)},
+            "components": {
+                "co": 230.0, "no": 1.2, "no2": 12.4, "o3": 54.2,
+                "so2": 3.1, "pm2_5": round(rng.uniform(2, 80), 1),
+                "pm10": round(rng.uniform(5, 120), 1), "nh3": 0.9
+            },
+            "dt": int(time.time()),
+        }],
+    }
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(request: Request):
+    await _upstream_delay()
+    if _should_fail():
+        return JSONResponse({"cod": 500, "message": "Internal error"}, status_code=500)
+    lat, lon = _coords_from_query(request)
+    rng = _seeded(f"forecast:{lat:.2f},{lon:.2f}")
+    base, now = rng.uniform(-10, 35), int(time.time()) // 10800 * 10800
+    steps = []
+    for i in range(40):
+        temp = round(base + rng.uniform(-4, 4), 1)
+        steps.append({
+            "dt": now + i * 10800,
+            "main": {"temp": temp, "feels_like": temp - 1, "temp_min": temp - 0.5,
+                     "temp_max": temp + 0.5, "humidity": rng.randint(20, 95)},
+            "weather": [{"main": rng.choice(["Clear", "Clouds", "Rain"]), "description": "forecast"}],
+            "wind": {"speed": round(rng.uniform(0, 12), 1)},
+            "pop": round(rng.random(), 2),
+        })
+    return {"list": steps, "city": {"coord": {"lat": lat, "lon": lon}, "timezone": 0}}
+
+
+@app.get("/data/2.5/air_pollution/forecast")
+async def air_pollution_forecast(request: Request):
+    await _upstream_delay()
+    if _should_fail():
+        return JSONResponse({"cod": 500, "message": "Internal error"}, status_code=500)
+    lat, lon = _coords_from_query(request)
+    rng = _seeded(f"aqi-forecast:{lat:.2f},{lon:.2f}")
+    now = int(time.time()) // 3600 * 3600
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "list": [
+            {"dt": now + i * 3600, "main": {"aqi": rng.randint(1, 5)},
+             "components": {"pm2_5": round(rng.uniform(2, 80), 1), "pm10": round(rng.uniform(5, 120), 1)}}
+            for i in range(96)
+        ],
+    }
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    model = body.get("model", "mistral:latest")
+    chunks = max(1, config["llm_chunks"])
+    per_chunk = config["llm_latency_ms"] / 1000 / chunks
+
+    if not body.get("stream", True):
+        await asyncio.sleep(config["llm_latency_ms"] / 1000)
+        return {"model": model, "message": {"role": "assistant", "content": FAKE_ANSWER}, "done": True}
+
+    async def stream():
+        size = -(-len(FAKE_ANSWER) // chunks)
+        for i in range(0, len(FAKE_ANSWER), size):
+            await asyncio.sleep(per_chunk)
+            piece = {"model": model, "message": {"role": "assistant", "content": FAKE_ANSWER[i:i + size]}, "done": False}
+            yield json.dumps(piece) + "\n"
+        yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--llm-latency-ms", type=float, default=config["llm_latency_ms"])
+    parser.add_argument("--llm-chunks", type=int, default=config["llm_chunks"])
+    args = parser.parse_args()
+    config.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        llm_latency_ms=args.llm_latency_ms, llm_chunks=args.llm_chunks
+    )
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
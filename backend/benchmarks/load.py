@@ -0,0 +1,92 @@
+"""End-to-end load driver for the guide API.
+
+Start the fake upstreams and the app (see benchmarks/fake_upstreams.py),
+then from the backend directory:
+
+    python -m benchmarks.load --url http://127.0.0.1:8000 --concurrency 32 --requests 2000 \\
+        --save bench_load.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --baseline bench_load.json
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.stats import compare, print_table, save_results, summarize
+
+DEFAULT_CITIES = [
+    "London", "Paris", "Tokyo", "New York", "Dubai", "Singapore", "Sydney",
+    "Rome", "Barcelona", "Amsterdam", "Seoul", "Bangkok", "Lisbon", "Cairo",
+    "Mumbai", "Toronto", "Berlin", "Istanbul", "Mexico City", "Cape Town",
+]
+
+
+def pick_city(cities: List[str], skew: float) -> str:
+    """Zipf-like pick so a few cities dominate, like real traffic."""
+    weights = [1 / (rank + 1) ** skew for rank in range(len(cities))]
+    return random.choices(cities, weights=weights)[0]
+
+
+async def run(url: str, path: str, cities: List[str], concurrency: int,
+              total: int, skew: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        async def worker():
+            for _ in remaining:
+                city = pick_city(cities, skew)
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path.format(city=city))
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies)
+    summary["throughput_rps"] = len(latencies) / elapsed if elapsed else 0.0
+    summary["errors"] = sum(n for status, n in statuses.items() if status != 200)
+    print(f"status codes: {dict(statuses)}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/{city}", help="request path; {city} is substituted")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for city popularity")
+    parser.add_argument("--cities", nargs="*", default=DEFAULT_CITIES)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args.url, args.path, args.cities, args.concurrency, args.requests, args.skew))
+    results = {f"GET {args.path} c={args.concurrency}": summary}
+
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmarks for the packing pipeline (no network needed).
+
+Run from the backend directory:
+
+    python -m benchmarks.micro --repeat 200 --save bench_micro.json
+    python -m benchmarks.micro --baseline bench_micro.json
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from benchmarks.fake_upstreams import FAKE_ANSWER
+from benchmarks.stats import compare, print_table, save_results, summarize
+from services import packing
+
+
+def bench(fn: Callable[[], object], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_initialize(repeat: int) -> Dict[str, Dict[str, float]]:
+    """Cold (encode + write) and warm (load from disk) index initialization."""
+    results = {}
+    workdir = Path(tempfile.mkdtemp(prefix="packing_index_"))
+    try:
+        def cold():
+            shutil.rmtree(workdir, ignore_errors=True)
+            packing.packing_index = None
+            packing.initialize_packing_service(workdir)
+
+        def warm():
+            packing.packing_index = None
+            packing.initialize_packing_service(workdir)
+
+        results["initialize_packing_service[cold]"] = bench(cold, max(1, repeat // 50), warmup=1)
+        results["initialize_packing_service[warm]"] = bench(warm, repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        packing.packing_index = None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_initialize(args.repeat))
+
+    packing.initialize_packing_service()
+    queries = [
+        packing.build_query(city, temp, aqi)
+        for city, temp, aqi in [("Paris", 18.3, 2), ("Tokyo", 27.0, 3), ("Dubai", 41.2, 4)]
+    ]
+    results["search_query[cached embedding]"] = bench(lambda: packing.search_query(queries[0]), args.repeat)
+    counter = iter(range(10 ** 9))
+    results["search_query[new query]"] = bench(
+        lambda: packing.search_query(packing.build_query(f"City{next(counter)}", 20.0, 2)), args.repeat
+    )
+    results["facet_lookup"] = bench(lambda: packing._facet_lookup("Tokyo", 27.0, 3), args.repeat)
+    results["extract_list_items"] = bench(lambda: packing.extract_list_items(FAKE_ANSWER), args.repeat)
+    results["extract_tips"] = bench(lambda: packing.extract_tips(FAKE_ANSWER), args.repeat)
+
+    print_table(results)
+    if args.save:
+        save_results(args.save, results)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
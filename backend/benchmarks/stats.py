@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_samples:
+        return float("nan")
+    rank = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds for samples given in seconds."""
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_ms": (sum(ordered) / count * 1000) if count else float("nan"),
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True))
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str,
+            tolerance: float = 0.10) -> List[str]:
+    """Compare against a saved baseline; returns one line per regression.
+
+    Latency metrics (`*_ms`) regress when they grow by more than `tolerance`,
+    throughput (`*_rps`) when it shrinks by more than `tolerance`.
+    """
+    baseline = json.loads(Path(baseline_path).read_text())
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old or not isinstance(value, (int, float)):
+                continue
+            change = (value - old) / old
+            if metric.endswith("_ms") and change > tolerance:
+                regressions.append(f"{name}.{metric}: {old:.2f} -> {value:.2f} (+{change:.0%})")
+            elif metric.endswith("_rps") and -change > tolerance:
+                regressions.append(f"{name}.{metric}: {old:.2f} -> {value:.2f} ({change:.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    columns = sorted({metric for metrics in results.values() for metric in metrics})
+    width = max(len(name) for name in results) if results else 10
+    print(f"{'benchmark':<{width}}  " + "  ".join(f"{c:>10}" for c in columns))
+    for name, metrics in results.items():
+        cells = []
+        for c in columns:
+            value = metrics.get(c)
+            cells.append(f"{value:>10.2f}" if isinstance(value, float) else f"{value!s:>10}")
+        print(f"{name:<{width}}  " + "  ".join(cells))
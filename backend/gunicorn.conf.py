@@ -0,0 +1,49 @@
+# Multi-worker deployment: `gunicorn -c gunicorn.conf.py main:app` from the backend directory.
+#
+# The embedding model is loaded once, in a separate embedding process that
+# every worker talks to over a Unix socket, and the packing index is loaded
+# in the master before fork as a memory-mapped file shared by all workers.
+# Adding workers therefore costs almost no extra model/index memory.
+#
+# Prometheus metrics are kept per process in PROMETHEUS_MULTIPROC_DIR, so
+# /metrics reports the sum over all workers whichever one answers the scrape.
+import glob
+import os
+import tempfile
+
+os.environ.setdefault("EMBEDDING_SOCKET", os.path.join(tempfile.gettempdir(), "travelbuddy-embed.sock"))
+os.environ.setdefault("PACKING_INDEX_SHARED", "1")
+# must be set before prometheus_client is imported (preload_app imports main right after this file)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "travelbuddy-prometheus"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+# samples of a previous run would otherwise be added to this one's
+for _stale in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(_stale)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+_embedding_process = None
+
+
+def on_starting(server):
+    global _embedding_process
+    from services.embedding_server import start_embedding_server
+    from services.packing import initialize_packing_service
+
+    _embedding_process = start_embedding_server(os.environ["EMBEDDING_SOCKET"])
+    # build (if needed) and map the index once; workers inherit the mapping
+    initialize_packing_service()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _embedding_process is not None:
+        _embedding_process.terminate()
@@ -1,59 +1,480 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, Request, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pathlib import Path
+from prometheus_client import CONTENT_TYPE_LATEST
+from pydantic import BaseModel
+from typing import List, Optional
+from services.cache import TTLCache, normalize_city
+from services.city_store import get_city_store, is_valid_city_name
+from services.culture import CultureService
+from services.forecast import ForecastService
+from services.geocode import GeocodeService
+from services.http import create_http_client
+from services.http_cache import cache_control, json_response
+from services.logging_setup import setup_logging
+from services.metrics import exposition
+from services.places import PlacesService
+from services.prewarm import PREWARM_INTERVAL_SECONDS, RefreshScheduler
+from services.static_assets import StaticAssets
+from services.upstream_guard import create_openweather_guard
 from services.weather import WeatherService
 from services.aqi import AQIService
-from services.packing import get_packing_suggestions  # Import the new packing service
+from services.packing import (
+    AI_SOURCE,
+    get_packing_suggestions,
+    get_packing_suggestions_batch,
+    get_trip_packing_suggestions,
+    initialize_packing_service,
+    packing_cache,
+    reload_packing_corpus,
+    stream_packing_suggestions,
+    warm_up_llm
+)
 
-# Get absolute path to frontend directory
-frontend_path = "/Users/samarpatil/travelbuddy/frontend"
+setup_logging()
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Upstream response cache settings (seconds / entries)
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "600"))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# How long expired data may still be served while OpenWeather is failing
+CACHE_LAST_KNOWN_GOOD_SECONDS = float(os.getenv("CACHE_LAST_KNOWN_GOOD_SECONDS", "86400"))
+# OpenWeather forecasts move in 3-hour steps, so they can be kept longer
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "1800"))
+
+# Longest trip accepted by /api/{city}/trip (forecasts only reach ~5 days ahead)
+TRIP_MAX_DAYS = int(os.getenv("TRIP_MAX_DAYS", "14"))
+
+# How often the packing corpus files are checked for edits (0 disables hot reload)
+PACKING_CORPUS_POLL_SECONDS = float(os.getenv("PACKING_CORPUS_POLL_SECONDS", "30"))
+
+# Time budget for a guide request before packing degrades to retrieval-only
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+
+# Reject cities the city store doesn't know instead of asking the geocoder
+CITY_STORE_STRICT = os.getenv("CITY_STORE_STRICT", "0") == "1"
+
+# Static city knowledge (culture, places) changes rarely
+CITY_INFO_MAX_AGE_SECONDS = int(os.getenv("CITY_INFO_MAX_AGE_SECONDS", "86400"))
+
+# Batch endpoint limits
+BATCH_MAX_CITIES = int(os.getenv("BATCH_MAX_CITIES", "50"))
+BATCH_UPSTREAM_CONCURRENCY = int(os.getenv("BATCH_UPSTREAM_CONCURRENCY", "8"))
+
+# Frontend directory (index.html and its assets)
+FRONTEND_DIR = Path(os.getenv(
+    "FRONTEND_DIR", str(Path(__file__).resolve().parent.parent / "frontend")
+))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client and one instance of each service for the whole app
+    app.state.http_client = create_http_client()
+    # Fingerprinted, precompressed frontend assets, built once per process
+    app.state.static_assets = StaticAssets(FRONTEND_DIR)
+    # One rate limit (shared across workers) and circuit breakers for the OpenWeather key
+    app.state.upstream_guard = create_openweather_guard()
+    # City names, aliases and coordinates: resolved locally before any upstream call
+    app.state.city_store = await run_in_threadpool(get_city_store)
+    app.state.geocoder = GeocodeService(
+        app.state.http_client, guard=app.state.upstream_guard,
+        suggest=app.state.city_store.suggestions
+    )
+    app.state.geocoder.preload_coordinates([
+        (city["name"], city["lat"], city["lon"])
+        for city in app.state.city_store.cities if "lat" in city
+    ])
+    app.state.culture_service = CultureService(app.state.city_store)
+    app.state.places_service = PlacesService(app.state.city_store)
+    app.state.weather_cache = TTLCache(
+        CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_STALE_SECONDS, name="weather",
+        last_known_good=CACHE_LAST_KNOWN_GOOD_SECONDS
+    )
+    app.state.aqi_cache = TTLCache(
+        CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_STALE_SECONDS, name="aqi",
+        last_known_good=CACHE_LAST_KNOWN_GOOD_SECONDS
+    )
+    app.state.forecast_cache = TTLCache(
+        FORECAST_CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_STALE_SECONDS, name="forecast",
+        last_known_good=CACHE_LAST_KNOWN_GOOD_SECONDS
+    )
+    app.state.weather_service = WeatherService(
+        app.state.http_client, app.state.geocoder, app.state.weather_cache,
+        app.state.upstream_guard
+    )
+    app.state.aqi_service = AQIService(
+        app.state.http_client, app.state.geocoder, app.state.aqi_cache,
+        app.state.upstream_guard
+    )
+    app.state.forecast_service = ForecastService(
+        app.state.http_client, app.state.geocoder, app.state.forecast_cache,
+        app.state.upstream_guard
+    )
+    app.state.prewarmer = RefreshScheduler(app.state.weather_service, app.state.aqi_service)
+    # Load the prebuilt packing index now rather than on the first request
+    await run_in_threadpool(initialize_packing_service)
+    # Model load happens in the background; requests meanwhile just wait for it
+    asyncio.ensure_future(run_in_threadpool(warm_up_llm))
+    reloader = None
+    if PACKING_CORPUS_POLL_SECONDS > 0:
+        reloader = asyncio.ensure_future(watch_packing_corpus())
+    prewarmer = None
+    if PREWARM_INTERVAL_SECONDS > 0:
+        prewarmer = asyncio.ensure_future(app.state.prewarmer.run())
+    try:
+        yield
+    finally:
+        if reloader is not None:
+            reloader.cancel()
+        if prewarmer is not None:
+            prewarmer.cancel()
+            await app.state.prewarmer.close()
+        await app.state.http_client.aclose()
+        app.state.geocoder.close()
+        # persist access times recorded since the last write-back
+        await run_in_threadpool(packing_cache.flush)
+
+async def watch_packing_corpus():
+    """Hot-reload the packing corpus; in-flight queries keep their index snapshot."""
+    while True:
+        await asyncio.sleep(PACKING_CORPUS_POLL_SECONDS)
+        try:
+            await run_in_threadpool(reload_packing_corpus)
+        except Exception as e:
+            logger.error("Packing corpus reload failed: %s", e)
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
-async def serve_index():
-    return FileResponse(frontend_path + "/index.html")
+async def serve_index(request: Request):
+    return request.app.state.static_assets.response(request, "index.html")
+
+@app.get("/static/{name:path}")
+async def serve_static(name: str, request: Request):
+    """Fingerprinted names are immutable; plain names and pages revalidate via ETag."""
+    return request.app.state.static_assets.response(request, name)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage latencies, cache hits, upstream errors."""
+    return Response(exposition(), media_type=CONTENT_TYPE_LATEST)
+
 
-app.mount("/static", StaticFiles(directory=frontend_path), name="static")
+def resolve_city(request: Request, city: str) -> str:
+    """Canonical city name, settled before any upstream call.
+
+    Names and aliases known to the city store map to its canonical name.
+    Malformed names are rejected with 400. Anything else is left to the
+    geocoder, whose 404 suggests close known names: a near miss is as
+    likely to be a real, lesser-known place as a typo. With
+    CITY_STORE_STRICT, close misspellings resolve to the known city and
+    everything else is rejected (404, with suggestions).
+    """
+    store = request.app.state.city_store
+    match = store.resolve(city) if CITY_STORE_STRICT else store.lookup(city)
+    if match is not None:
+        return match["name"]
+    if not is_valid_city_name(city):
+        raise HTTPException(status_code=400, detail=f"Invalid city name '{city}'")
+    if CITY_STORE_STRICT:
+        suggestions = store.suggestions(city)
+        raise HTTPException(
+            status_code=404,
+            detail=f"City '{city}' not found"
+            + (f"; did you mean {', '.join(suggestions)}?" if suggestions else "")
+        )
+    return city.strip()
+
+
+def guide_cache_control(request: Request, city: str, degraded: bool) -> str:
+    """Let clients and the CDN keep a guide until its weather/AQI data goes stale.
+
+    Degraded answers (no LLM) are only revalidated, so a better one replaces
+    them as soon as it exists.
+    """
+    if degraded:
+        return "no-cache"
+    key = normalize_city(city)
+    fresh_for = min(
+        request.app.state.weather_cache.fresh_for(key),
+        request.app.state.aqi_cache.fresh_for(key)
+    )
+    return cache_control(fresh_for, stale_while_revalidate=CACHE_STALE_SECONDS)
+
+
+def fallback_packing(weather: dict, aqi: dict) -> dict:
+    return {
+        "packing_list": [
+            "Light clothing",
+            "Sunscreen",
+            "Water bottle",
+            "Umbrella",
+            "Comfortable shoes"
+        ],
+        "travel_tips": [
+            f"Stay hydrated in {weather['temp']}°C weather",
+            f"Check air quality alerts (Current AQI: {aqi['aqi']})",
+            "Plan indoor activities when AQI is high"
+        ]
+    }
 
 
 @app.get("/api/{city}")
-async def get_guide(city: str):
+async def get_guide(city: str, request: Request):
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    city = resolve_city(request, city)
     try:
-        weather = WeatherService().get_weather(city)
-        aqi = AQIService().get_aqi(city)
+        # Weather and AQI run concurrently and share one geocode resolution
+        weather, aqi = await asyncio.gather(
+            request.app.state.weather_service.get_weather(city),
+            request.app.state.aqi_service.get_aqi(city)
+        )
+        # only cities that turned out to exist count towards the hot set
+        request.app.state.prewarmer.record(city)
         
-        packing = get_packing_suggestions(
+        # Embedding, FAISS and Ollama are blocking, keep them off the event loop
+        packing = await run_in_threadpool(
+            get_packing_suggestions,
             city=city,
             temperature=weather["temp"],
-            aqi=aqi["aqi"]
+            aqi=aqi["aqi"],
+            deadline=deadline
         )
         
         # Only use fallback if there's an error
+        degraded = packing.get("source") != AI_SOURCE
         if "error" in packing:
-            print(f"\n[WARNING] Packing service error: {packing['error']}")  # Log the error
-            packing = {
-                "packing_list": [
-                    "Light clothing",
-                    "Sunscreen",
-                    "Water bottle",
-                    "Umbrella",
-                    "Comfortable shoes"
-                ],
-                "travel_tips": [
-                    f"Stay hydrated in {weather['temp']}°C weather",
-                    f"Check air quality alerts (Current AQI: {aqi['aqi']})",
-                    "Plan indoor activities when AQI is high"
-                ]
-            }
+            logger.warning("Packing service error: %s", packing['error'])
+            packing = fallback_packing(weather, aqi)
         
-        return {
-            "weather": weather,
-            "aqi": aqi,
-            "packing": packing
-        }
+        return json_response(
+            request,
+            {
+                "city": city,
+                "weather": weather,
+                "aqi": aqi,
+                "packing": packing
+            },
+            guide_cache_control(request, city, degraded)
+        )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("API error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/{city}/trip")
+async def get_trip_guide(
+    city: str,
+    request: Request,
+    start: Optional[datetime.date] = None,
+    days: int = Query(5, ge=1, le=TRIP_MAX_DAYS)
+):
+    """Daily forecast and one packing list for a multi-day trip.
+
+    `start` defaults to today in the city's timezone. Days beyond the
+    forecast horizon are left out and the response is marked `partial`.
+    """
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    city = resolve_city(request, city)
+    try:
+        trip = await request.app.state.forecast_service.get_trip(city, start, days)
+
+        packing = await run_in_threadpool(
+            get_trip_packing_suggestions,
+            city=city,
+            days=trip["days"],
+            deadline=deadline
+        )
+        degraded = packing.get("source") != AI_SOURCE
+        if "error" in packing:
+            logger.warning("Packing service error: %s", packing['error'])
+            known_aqi = [day["aqi"] for day in trip["days"] if day["aqi"] is not None]
+            packing = fallback_packing(
+                {"temp": max(day["temp_max"] for day in trip["days"])},
+                {"aqi": max(known_aqi) if known_aqi else "unknown"}
+            )
+
+        fresh_for = request.app.state.forecast_cache.fresh_for(normalize_city(city))
+        return json_response(
+            request,
+            {"city": city, **trip, "packing": packing},
+            "no-cache" if degraded else cache_control(fresh_for, CACHE_STALE_SECONDS)
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"\n[ERROR] API error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("API error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/{city}/culture")
+async def get_culture(city: str, request: Request):
+    """Cultural tips for a city, from the in-memory city store."""
+    city = resolve_city(request, city)
+    return json_response(
+        request,
+        {"city": city, "culture": request.app.state.culture_service.get_tips(city)},
+        cache_control(CITY_INFO_MAX_AGE_SECONDS)
+    )
+
+
+@app.get("/api/{city}/places")
+async def get_places(city: str, request: Request):
+    """Notable places in a city, from the in-memory city store."""
+    city = resolve_city(request, city)
+    return json_response(
+        request,
+        {"city": city, "places": request.app.state.places_service.get_places(city)},
+        cache_control(CITY_INFO_MAX_AGE_SECONDS)
+    )
+
+
+class BatchGuideRequest(BaseModel):
+    cities: List[str]
+
+
+@app.post("/api/batch")
+async def get_guides(body: BatchGuideRequest, request: Request):
+    """Guides for several cities in one call.
+
+    Cities are deduplicated by canonical name (see resolve_city), upstream data is
+    fetched concurrently under a shared limit, and packing retrieval runs as
+    one batch. There is one result per submitted name, in input order, carrying
+    that name as `input`; failures are reported inline.
+    """
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    unique, inputs = {}, []
+    for city in body.cities:
+        try:
+            canonical = resolve_city(request, city)
+        except HTTPException as e:
+            inputs.append((city, {"city": city, "error": {"status": e.status_code, "detail": e.detail}}))
+            continue
+        key = normalize_city(canonical)
+        unique.setdefault(key, canonical)
+        inputs.append((city, key))
+    if len(unique) > BATCH_MAX_CITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many cities: {len(unique)} (max {BATCH_MAX_CITIES})"
+        )
+
+    limit = asyncio.Semaphore(BATCH_UPSTREAM_CONCURRENCY)
+
+    async def fetch(city: str) -> dict:
+        async with limit:
+            try:
+                weather, aqi = await asyncio.gather(
+                    request.app.state.weather_service.get_weather(city),
+                    request.app.state.aqi_service.get_aqi(city)
+                )
+                return {"city": city, "weather": weather, "aqi": aqi}
+            except HTTPException as e:
+                return {"city": city, "error": {"status": e.status_code, "detail": e.detail}}
+            except Exception as e:
+                logger.error("API error for %s: %s", city, e)
+                return {"city": city, "error": {"status": 500, "detail": str(e)}}
+
+    results = await asyncio.gather(*(fetch(city) for city in unique.values()))
+
+    ok = [r for r in results if "error" not in r]
+    for result in ok:
+        request.app.state.prewarmer.record(result["city"])
+    packings = await run_in_threadpool(
+        get_packing_suggestions_batch,
+        [(r["city"], r["weather"]["temp"], r["aqi"]["aqi"]) for r in ok],
+        deadline
+    )
+    for result, packing in zip(ok, packings):
+        if "error" in packing:
+            logger.warning("Packing service error for %s: %s", result['city'], packing['error'])
+            packing = fallback_packing(result["weather"], result["aqi"])
+        result["packing"] = packing
+
+    by_key = dict(zip(unique, results))
+    return {"results": [
+        {"input": city, **(by_key[entry] if isinstance(entry, str) else entry)}
+        for city, entry in inputs
+    ]}
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.get("/api/{city}/stream")
+async def stream_guide(city: str, request: Request):
+    """NDJSON variant of get_guide.
+
+    Emits a `city` event with the canonical name, then a `weather` and an
+    `aqi` event as soon as each upstream call returns,
+    then `packing_item` / `travel_tip` events while the LLM is generating, and
+    finally `done`. Upstream failures are reported as a single `error` event.
+    """
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    city = resolve_city(request, city)
+
+    async def events():
+        yield _ndjson({"type": "city", "name": city})
+        tasks = {
+            asyncio.ensure_future(request.app.state.weather_service.get_weather(city)): "weather",
+            asyncio.ensure_future(request.app.state.aqi_service.get_aqi(city)): "aqi"
+        }
+        results = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+                    yield _ndjson({"type": tasks[task], "data": results[tasks[task]]})
+        except HTTPException as e:
+            yield _ndjson({"type": "error", "status": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            logger.error("API error: %s", e)
+            yield _ndjson({"type": "error", "status": 500, "detail": str(e)})
+            return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        weather, aqi = results["weather"], results["aqi"]
+        request.app.state.prewarmer.record(city)
+        emitted = 0
+        packing_events = stream_packing_suggestions(
+            city=city, temperature=weather["temp"], aqi=aqi["aqi"], deadline=deadline
+        )
+        async for event in iterate_in_threadpool(packing_events):
+            if event["type"] == "packing_error":
+                logger.warning("Packing service error: %s", event['error'])
+                if not emitted:
+                    fallback = fallback_packing(weather, aqi)
+                    for item in fallback["packing_list"]:
+                        yield _ndjson({"type": "packing_item", "text": item})
+                    for tip in fallback["travel_tips"]:
+                        yield _ndjson({"type": "travel_tip", "text": tip})
+                    yield _ndjson({"type": "packing_done", "source": "Fallback"})
+                continue
+            emitted += 1
+            yield _ndjson(event)
+        yield _ndjson({"type": "done"})
+
+    return StreamingResponse(
+        events(), media_type="application/x-ndjson", headers={"Cache-Control": "no-store"}
+    )
@@ -1,39 +1,61 @@
 import os
-import requests
+import logging
+import httpx
 from fastapi import HTTPException
 from dotenv import load_dotenv
+from typing import Optional
+from services.http import OPENWEATHER_BASE_URL
+from services.cache import TTLCache, normalize_city
+from services.geocode import GeocodeService
+from services.logging_setup import log_payload
+from services.metrics import record_upstream_error, timed
+from services.upstream_guard import UpstreamGuard
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+# OpenWeatherMap's AQI scale
+AQI_LEVELS = {
+    1: "Good",
+    2: "Fair",
+    3: "Moderate",
+    4: "Poor",
+    5: "Very Poor"
+}
+
+def categorize_aqi(aqi: int) -> str:
+    return AQI_LEVELS.get(aqi, "Unknown")
 
 class AQIService:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient, geocoder: GeocodeService,
+                 cache: Optional[TTLCache] = None, guard: Optional[UpstreamGuard] = None):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")  # Same key as weather service
         if not self.api_key:
             raise RuntimeError("Missing OPENWEATHER_API_KEY in .env")
-        self.base_url = "https://api.openweathermap.org/data/2.5/air_pollution"
+        self.base_url = f"{OPENWEATHER_BASE_URL}/data/2.5/air_pollution"
+        self.client = client
+        self.geocoder = geocoder
+        self.cache = cache
+        self.guard = guard or UpstreamGuard(failure_threshold=0)
         
-        # Debug: Verify key is loaded
-        print(f"AQI Service Initialized. Using API Key: {self.api_key[:5]}...")
+        # Verify key is loaded
+        logger.info("AQI Service Initialized. Using API Key: %s...", self.api_key[:5])
 
-    def _get_coordinates(self, city: str):
-        """Helper method to get coordinates for a city"""
-        geocode_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={self.api_key}"
-        try:
-            response = requests.get(geocode_url, timeout=5)
-            data = response.json()
-            if not data:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"City '{city}' not found"
-                )
-            return data[0]['lat'], data[0]['lon']
-        except Exception as e:
-            raise HTTPException(
-                status_code=502,
-                detail=f"Geocoding failed: {str(e)}"
-            )
+    async def get_aqi(self, city: str):
+        """AQI lookup served from the TTL cache when configured (see _fetch_aqi)"""
+        if self.cache is None:
+            return await self._fetch_aqi(city)
+        return await self.cache.get_or_fetch(
+            normalize_city(city), lambda: self._fetch_aqi(city)
+        )
+
+    async def refresh_aqi(self, city: str):
+        """Re-fetch into the cache ahead of expiry (see services/prewarm.py)"""
+        if self.cache is None:
+            return await self._fetch_aqi(city)
+        return await self.cache.refresh(normalize_city(city), lambda: self._fetch_aqi(city))
 
-    def get_aqi(self, city: str):
+    async def _fetch_aqi(self, city: str):
         """
         Fetches AQI data using OpenWeatherMap Air Pollution API
         Returns: 
@@ -53,16 +75,20 @@ class AQIService:
             }
         """
         try:
-            # Step 1: Get coordinates for the city
-            lat, lon = self._get_coordinates(city)
-            print(f"\n[DEBUG] Coordinates for {city}: lat={lat}, lon={lon}")
+            # Step 1: Get coordinates for the city (shared geocode store)
+            lat, lon = await self.geocoder.resolve(city)
+            logger.debug("Coordinates for %s: lat=%s, lon=%s", city, lat, lon)
 
             # Step 2: Fetch AQI data
-            url = f"{self.base_url}?lat={lat}&lon={lon}&appid={self.api_key}"
-            print(f"[DEBUG] AQI Request URL: {url.replace(self.api_key, '***')}")
-            
-            response = requests.get(url, timeout=10)
-            print(f"[DEBUG] Response status: {response.status_code}")
+            with timed("aqi"):
+                response = await self.guard.call("air_pollution", lambda: self.client.get(
+                    self.base_url,
+                    params={"lat": lat, "lon": lon, "appid": self.api_key},
+                    timeout=10
+                ))
+            logger.debug("AQI response status: %s", response.status_code)
+            if response.status_code != 200:
+                record_upstream_error("air_pollution", response.status_code)
 
             if not response.content:
                 raise HTTPException(
@@ -71,7 +97,7 @@ class AQIService:
                 )
 
             data = response.json()
-            print(f"[DEBUG] Raw API Response: {data}")
+            log_payload(logger, "Raw AQI API Response", data)
 
             # Step 3: Handle API errors
             if response.status_code != 200:
@@ -91,7 +117,13 @@ class AQIService:
                 "components": aqi_data['components']
             }
 
-        except requests.exceptions.RequestException as e:
+        except HTTPException:
+            raise
+        except httpx.HTTPError as e:
+            record_upstream_error(
+                "air_pollution",
+                "timeout" if isinstance(e, httpx.TimeoutException) else "connection_error"
+            )
             raise HTTPException(
                 status_code=502,
                 detail=f"AQI API request failed: {str(e)}"
@@ -104,11 +136,4 @@ class AQIService:
 
     def _categorize_aqi(self, aqi: int) -> str:
         """Categorizes AQI value according to OpenWeatherMap's scale"""
-        scale = {
-            1: "Good",
-            2: "Fair",
-            3: "Moderate",
-            4: "Poor",
-            5: "Very Poor"
-        }
-        return scale.get(aqi, "Unknown")
\ No newline at end of file
+        return categorize_aqi(aqi)
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+
+
+class QueryBatcher:
+    """Collects concurrent retrieval queries and serves them in micro-batches.
+
+    Callers block on `search()` from worker threads. A single background thread
+    drains the queue for up to `max_wait` seconds (or `max_batch_size` queries),
+    encodes all uncached queries in one call, runs one batched search and hands
+    each caller its own result. Query embeddings are kept in an LRU cache since
+    the templated packing queries repeat heavily.
+
+    A query may carry `candidates` (e.g. ids pre-filtered by metadata); the
+    search callable receives them alongside the vectors, one entry per row
+    (None where the whole index should be searched).
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 search: Callable[[np.ndarray, List[Optional[Any]]], Sequence[Any]],
+                 max_batch_size: int = 32, max_wait: float = 0.005,
+                 cache_size: int = 1024):
+        self.encode = encode
+        self.search_vectors = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # threads don't survive fork; a forked worker starts its own
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, query: str, candidates: Optional[Any] = None) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((query, candidates, future))
+        return future
+
+    def search(self, query: str, candidates: Optional[Any] = None) -> Any:
+        return self.submit(query, candidates).result()
+
+    def search_many(self, queries: Sequence[str],
+                    candidates: Optional[Sequence[Optional[Any]]] = None) -> List[Any]:
+        candidates = candidates or [None] * len(queries)
+        futures = [self.submit(q, c) for q, c in zip(queries, candidates)]
+        return [f.result() for f in futures]
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="packing-query-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[tuple]) -> None:
+        try:
+            vectors = self._embed([query for query, _, _ in batch])
+            results = self.search_vectors(vectors, [candidates for _, candidates, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _embed(self, queries: List[str]) -> np.ndarray:
+        """Embed a batch, encoding only the distinct queries missing from the cache."""
+        missing = [q for q in dict.fromkeys(queries) if q not in self._embeddings]
+        if missing:
+            encoded = np.asarray(self.encode(missing), dtype=np.float32)
+            for q, vec in zip(missing, encoded):
+                self._embeddings[q] = vec
+        rows = []
+        for q in queries:
+            self._embeddings.move_to_end(q)
+            rows.append(self._embeddings[q])
+        while len(self._embeddings) > self.cache_size:
+            self._embeddings.popitem(last=False)
+        return np.ascontiguousarray(np.stack(rows), dtype=np.float32)
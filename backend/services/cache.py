@@ -0,0 +1,141 @@
+import asyncio
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.metrics import record_cache
+
+
+def normalize_city(city: str) -> str:
+    """Key for a city name: insensitive to case, accents, punctuation and whitespace."""
+    folded = "".join(
+        c for c in unicodedata.normalize("NFKD", city) if not unicodedata.combining(c)
+    )
+    return " ".join(re.sub(r"[^\w\s]", " ", folded.casefold()).split())
+
+
+class TTLCache:
+    """Async TTL cache with LRU eviction, single-flight fetches and stale-while-revalidate.
+
+    - Entries younger than `ttl` are served directly.
+    - Entries younger than `ttl + stale_ttl` are served as-is while one
+      background refresh runs.
+    - Concurrent misses for the same key share a single upstream call.
+    - Failed fetches are never cached; every waiter sees the exception.
+    - With `last_known_good`, an upstream failure (5xx or a non-HTTP error)
+      is answered with the expired entry instead, if it is no older than
+      `ttl + stale_ttl + last_known_good`. Dict values come back marked
+      `"stale": True` with their `age_seconds`.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024, stale_ttl: float = 0,
+                 name: str = "response", last_known_good: float = 0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.last_known_good = last_known_good
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.last_known_good_hits = 0
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache(self.name, "hit")
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                record_cache(self.name, "stale")
+                self._start_fetch(key, fetch)
+                return value
+
+        self.misses += 1
+        record_cache(self.name, "miss")
+        try:
+            # shield so one cancelled waiter doesn't cancel the shared fetch
+            return await asyncio.shield(self._start_fetch(key, fetch))
+        except Exception as e:
+            fallback = self._last_known_good(key, e)
+            if fallback is None:
+                raise
+            return fallback
+
+    def _last_known_good(self, key: Hashable, error: Exception) -> Any:
+        if self.last_known_good <= 0 or getattr(error, "status_code", 500) < 500:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age >= self.ttl + self.stale_ttl + self.last_known_good:
+            return None
+        self.last_known_good_hits += 1
+        record_cache(self.name, "last_known_good")
+        if isinstance(value, dict):
+            return {**value, "stale": True, "age_seconds": int(age)}
+        return value
+
+    def _start_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            # background refreshes may have no waiter; consume their exception
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def set(self, key: Hashable, value: Any, age: float = 0) -> None:
+        """Store `value`; `age` is how long ago it was fetched (e.g. by another worker)."""
+        self._entries[key] = (value, time.monotonic() - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Fetch and store a new value now, even if the cached one is still fresh."""
+        return await asyncio.shield(self._start_fetch(key, fetch))
+
+    def peek(self, key: Hashable) -> Any:
+        """The cached value (fresh or not) without counting a lookup, or None."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def fresh_for(self, key: Hashable) -> float:
+        """Seconds until the cached entry for `key` goes stale (0 if absent or already stale)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, self.ttl - (time.monotonic() - entry[1]))
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "last_known_good_hits": self.last_known_good_hits,
+        }
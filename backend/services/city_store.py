@@ -0,0 +1,155 @@
+"""In-memory city knowledge store: names, aliases, coordinates, culture and places.
+
+Loaded once from CITY_STORE_PATH (a JSON list of cities). Every name and
+alias is indexed under its normalized key (case-, accent- and
+punctuation-insensitive, see services/cache.py:normalize_city), and keys are
+also indexed by character trigram to find the closest known cities for a
+misspelled name. Fuzzy matches are only suggestions unless they are also
+within a few character edits (see `resolve`): many real places are a
+trigram away from a better-known one (Cairns/Cairo, York/New York).
+"""
+import json
+import logging
+import os
+import threading
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from services.cache import normalize_city
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CITY_STORE_PATH = os.getenv("CITY_STORE_PATH", str(DATA_DIR / "cities.json"))
+# Minimum trigram similarity (Jaccard, 0-1) for a fuzzy match
+CITY_FUZZY_THRESHOLD = float(os.getenv("CITY_FUZZY_THRESHOLD", "0.4"))
+# Character edits a fuzzy match may need per this many characters of the name (at least one)
+CITY_FUZZY_CHARS_PER_EDIT = 5
+
+MAX_CITY_NAME_LENGTH = 85
+# Besides letters (any script) and spaces, the punctuation found in place names
+CITY_PUNCTUATION = set(".,'’()-")
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def is_valid_city_name(city: str) -> bool:
+    """Cheap shape check, so obviously bogus input never reaches the geocoder."""
+    city = city.strip()
+    return (
+        0 < len(city) <= MAX_CITY_NAME_LENGTH
+        and any(c.isalpha() for c in city)
+        and all(
+            c.isalpha() or c.isspace() or c in CITY_PUNCTUATION or unicodedata.combining(c)
+            for c in city
+        )
+    )
+
+
+class CityStore:
+    def __init__(self, cities: List[Dict[str, Any]], fuzzy_threshold: float = CITY_FUZZY_THRESHOLD):
+        self.cities = cities
+        self.fuzzy_threshold = fuzzy_threshold
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        for city in cities:
+            for name in [city["name"], *city.get("aliases", [])]:
+                key = normalize_city(name)
+                if key in self._by_key and self._by_key[key] is not city:
+                    logger.warning("City store: '%s' is ambiguous, keeping %s", name, self._by_key[key]["name"])
+                    continue
+                self._by_key[key] = city
+                self._trigrams[key] = trigrams(key)
+                for gram in self._trigrams[key]:
+                    self._postings[gram].add(key)
+
+    @classmethod
+    def load(cls, path: str = CITY_STORE_PATH) -> "CityStore":
+        with open(path, encoding="utf-8") as f:
+            store = cls(json.load(f))
+        logger.info("City store loaded: %d cities, %d names", len(store.cities), len(store._by_key))
+        return store
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """Exact match on a normalized name or alias."""
+        return self._by_key.get(normalize_city(name))
+
+    def similar(self, name: str, limit: int = 3) -> List[tuple]:
+        """(similarity, key) of the closest known names by trigram overlap, best first."""
+        key = normalize_city(name)
+        grams = trigrams(key)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+        scored = [
+            (count / (len(grams) + len(self._trigrams[candidate]) - count), candidate)
+            for candidate, count in shared.items()
+        ]
+        return sorted(scored, reverse=True)[:limit]
+
+    def resolve(self, name: str) -> Optional[Dict[str, Any]]:
+        """Exact/alias match, else a close misspelling of a known name.
+
+        A fuzzy match needs both the trigram similarity threshold and at most
+        one character edit per CITY_FUZZY_CHARS_PER_EDIT characters, so a
+        different place with a similar name ("Barcelos") isn't taken for a
+        known one ("Barcelona"). Only use this where unknown names would be
+        rejected anyway (CITY_STORE_STRICT); otherwise prefer `lookup` and let
+        the geocoder decide.
+        """
+        city = self.lookup(name)
+        if city is not None:
+            return city
+        key = normalize_city(name)
+        if len(key) < 4:
+            return None
+        max_edits = max(1, len(key) // CITY_FUZZY_CHARS_PER_EDIT)
+        for similarity, candidate in self.similar(name):
+            if similarity >= self.fuzzy_threshold and edit_distance(key, candidate) <= max_edits:
+                return self._by_key[candidate]
+        return None
+
+    def suggestions(self, name: str, limit: int = 3) -> List[str]:
+        """Known cities whose names are similar enough to offer as "did you mean"."""
+        names = []
+        for similarity, key in self.similar(name, limit=limit * 2):
+            if similarity >= self.fuzzy_threshold and self._by_key[key]["name"] not in names:
+                names.append(self._by_key[key]["name"])
+        return names[:limit]
+
+    def canonical_key(self, name: str) -> str:
+        """Normalized canonical name if the store knows the city, else the normalized input."""
+        city = self.lookup(name)
+        return normalize_city(city["name"] if city is not None else name)
+
+
+_store: Optional[CityStore] = None
+_store_lock = threading.Lock()
+
+
+def get_city_store() -> CityStore:
+    """The process-wide store, loaded on first use (main.py loads it at startup)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CityStore.load()
+    return _store
@@ -1,14 +1,14 @@
+from typing import Optional
+
+from services.city_store import CityStore, get_city_store
+
+
 class CultureService:
+    def __init__(self, store: Optional[CityStore] = None):
+        self.store = store or get_city_store()
+
     def get_tips(self, destination: str):
-        cultural_data = {
-            "tokyo": {
-                "greeting": "Bow slightly when greeting",
-                "dining": "Never pass food with chopsticks to chopsticks"
-            },
-            "paris": {
-                "greeting": "Cheek kisses are common among friends",
-                "dining": "Keep hands on the table during meals"
-            }
-        }
-        city_key = destination.lower()
-        return cultural_data.get(city_key, {"error": "No cultural data available"})
\ No newline at end of file
+        city = self.store.lookup(destination)
+        if city is None or not city.get("culture"):
+            return {"error": "No cultural data available"}
+        return city["culture"]
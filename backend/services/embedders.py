@@ -0,0 +1,183 @@
+"""Embedding backends for the packing retriever.
+
+Every backend exposes `encode(texts) -> np.ndarray` (float32, one row per
+text, L2-normalised like all-MiniLM-L6-v2's own pipeline):
+
+- "sentence-transformers" (default): the reference model, needs torch.
+- "onnx": the same model exported to ONNX (optionally int8-quantized) and run
+  with onnxruntime + tokenizers, which is much lighter to import and run.
+
+Export and check the ONNX backend from the backend directory:
+
+    python -m services.embedders export            # writes model.onnx + model.int8.onnx
+    python -m services.embedders verify            # compares retrieval with the reference
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_DIR = Path(os.getenv(
+    "EMBEDDING_ONNX_DIR",
+    str(Path(__file__).resolve().parent.parent / "data" / "onnx" / EMBEDDING_MODEL)
+))
+# Use the int8-quantized export when available
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "1") == "1"
+
+
+class SentenceTransformerEmbedder:
+    """Reference backend: the full sentence-transformers model."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: Sequence[str], **kwargs) -> np.ndarray:
+        return np.asarray(self.model.encode(list(texts), **kwargs), dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """all-MiniLM-L6-v2 run through onnxruntime, with mean pooling + normalisation."""
+
+    def __init__(self, model_dir: Path = EMBEDDING_ONNX_DIR, quantized: bool = EMBEDDING_ONNX_QUANTIZED,
+                 max_length: int = 256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = model_dir / "model.int8.onnx"
+        if not (quantized and model_path.exists()):
+            model_path = model_dir / "model.onnx"
+        self.model_path = model_path
+        self.session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64, **kwargs) -> np.ndarray:
+        rows = []
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feed = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self.session.run(None, feed)[0]
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            rows.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(rows), dtype=np.float32)
+
+
+def embedder_id() -> str:
+    """Identifies the configured backend; part of the packing index hash."""
+    if EMBEDDING_BACKEND == "onnx":
+        suffix = "int8" if EMBEDDING_ONNX_QUANTIZED else "fp32"
+        return f"onnx-{suffix}:{EMBEDDING_MODEL}"
+    return f"sentence-transformers:{EMBEDDING_MODEL}"
+
+
+def create_local_embedder():
+    """Instantiate the configured in-process backend."""
+    if EMBEDDING_BACKEND == "onnx":
+        return OnnxEmbedder()
+    if EMBEDDING_BACKEND == "sentence-transformers":
+        return SentenceTransformerEmbedder()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'")
+
+
+def export_onnx(model_dir: Path = EMBEDDING_ONNX_DIR, quantize: bool = True) -> None:
+    """Export the reference model to ONNX (needs torch/transformers, build time only)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    name = f"sentence-transformers/{EMBEDDING_MODEL}"
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModel.from_pretrained(name).eval()
+    model_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(model_dir))
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in input_names), str(model_dir / "model.onnx"),
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic, opset_version=14
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            str(model_dir / "model.onnx"), str(model_dir / "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+
+
+def verify_embedder(candidate, reference, documents: List[str], queries: List[str]) -> Dict[str, float]:
+    """Compare a candidate backend with the reference on the packing corpus.
+
+    Returns the share of queries whose nearest document is the same under
+    both backends, and the cosine similarity between their query vectors.
+    """
+    from services.shared_index import MmapFlatIndex
+
+    ref_docs, cand_docs = reference.encode(documents), candidate.encode(documents)
+    ref_queries, cand_queries = reference.encode(queries), candidate.encode(queries)
+    _, ref_top = MmapFlatIndex(ref_docs).search(ref_queries, k=1)
+    _, cand_top = MmapFlatIndex(cand_docs).search(cand_queries, k=1)
+    cosine = np.einsum("ij,ij->i", ref_queries, cand_queries) / (
+        np.linalg.norm(ref_queries, axis=1) * np.linalg.norm(cand_queries, axis=1)
+    )
+    return {
+        "top1_agreement": float((ref_top[:, 0] == cand_top[:, 0]).mean()),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export the model to ONNX")
+    export.add_argument("--no-quantize", action="store_true")
+    verify = sub.add_parser("verify", help="check ONNX retrieval against the reference model")
+    verify.add_argument("--fp32", action="store_true", help="verify the unquantized export")
+    verify.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(quantize=not args.no_quantize)
+        print(f"ONNX model written to {EMBEDDING_ONNX_DIR}")
+        return
+
+    from services.packing import build_query
+    from services.packing_index import load_corpus
+    documents = [entry["text"] for entry in load_corpus()]
+    queries = list(documents) + [
+        build_query(city, temperature, aqi)
+        for city in ("Paris", "Tokyo", "Dubai", "Reykjavik", "Lima", "Sydney")
+        for temperature in (-5.0, 12.5, 24.0, 36.0)
+        for aqi in (1, 3, 5)
+    ]
+    report = verify_embedder(
+        OnnxEmbedder(quantized=not args.fp32), SentenceTransformerEmbedder(), list(documents), queries
+    )
+    for key, value in report.items():
+        print(f"{key}: {value:.4f}")
+    sys.exit(0 if report["top1_agreement"] >= args.min_agreement else 1)
+
+
+if __name__ == "__main__":
+    main()
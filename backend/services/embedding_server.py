@@ -0,0 +1,137 @@
+"""Shared embedding process for multi-worker deployments.
+
+The embedding model (see services/embedders.py) is loaded once in a dedicated
+process that serves encode requests over a Unix socket. Workers talk to it
+through RemoteEmbedder, which has the same `encode(texts)` call as the model,
+so adding workers costs no extra model memory.
+
+Wire format, both directions: 4-byte big-endian length + payload.
+Request payload is a JSON list of strings. Response payload is a 4-byte
+big-endian row count followed by float32 rows, or a JSON {"error": ...}
+when the row count is 0xFFFFFFFF.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET")
+_ERROR = 0xFFFFFFFF
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding socket closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return _recv_exact(sock, size)
+
+
+def _send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+class RemoteEmbedder:
+    """Client for the shared embedding process; one connection per thread."""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        # a forked worker must not share the parent's connection
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        try:
+            sock = self._connection()
+            _send_frame(sock, json.dumps(list(texts)).encode("utf-8"))
+            payload = _recv_frame(sock)
+        except OSError:
+            # drop the broken connection so the next call reconnects
+            self._local.sock = None
+            raise
+        (rows,) = struct.unpack(">I", payload[:4])
+        if rows == _ERROR:
+            raise RuntimeError(json.loads(payload[4:])["error"])
+        return np.frombuffer(payload[4:], dtype=np.float32).reshape(rows, -1)
+
+
+class _EncodeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                texts = json.loads(_recv_frame(self.request))
+            except ConnectionError:
+                return
+            try:
+                with self.server.model_lock:
+                    vectors = self.server.model.encode(texts)
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                payload = struct.pack(">I", len(vectors)) + vectors.tobytes()
+            except Exception as e:
+                payload = struct.pack(">I", _ERROR) + json.dumps({"error": str(e)}).encode("utf-8")
+            _send_frame(self.request, payload)
+
+
+def serve(socket_path: str) -> None:
+    """Load the model and serve encode requests until the process is killed."""
+    from services.embedders import create_local_embedder, embedder_id
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _EncodeHandler)
+    server.daemon_threads = True
+    server.model = create_local_embedder()
+    server.model_lock = threading.Lock()
+    logger.info("Embedding server for %s listening on %s", embedder_id(), socket_path)
+    server.serve_forever()
+
+
+def start_embedding_server(socket_path: str, timeout: float = 120) -> multiprocessing.Process:
+    """Start the embedding process and wait until it accepts connections.
+
+    Uses the spawn start method so torch is never initialised in the parent.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(socket_path,), name="embedding-server", daemon=True
+    )
+    process.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("Embedding server exited during startup")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Embedding server did not start within {timeout}s")
@@ -0,0 +1,223 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from services.aqi import categorize_aqi
+from services.cache import TTLCache, normalize_city
+from services.geocode import GeocodeService
+from services.http import OPENWEATHER_BASE_URL
+from services.logging_setup import log_payload
+from services.metrics import record_upstream_error, timed
+from services.upstream_guard import UpstreamGuard
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# Columns of the per-timestep weather matrix
+TEMP, TEMP_MIN, TEMP_MAX, HUMIDITY, WIND, POP = range(6)
+
+
+def _day_starts(days: np.ndarray) -> np.ndarray:
+    """Start offsets of each run of equal (sorted) day numbers, for ufunc.reduceat."""
+    return np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+
+
+def aggregate_daily(forecast: Dict[str, Any], pollution: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Collapse 3-hourly weather and hourly air-pollution forecasts into per-day summaries.
+
+    Days are calendar days in the city's local time. Every statistic comes from
+    one reduceat pass over a (timesteps x columns) matrix, rather than a Python
+    loop per day.
+    """
+    steps = forecast.get("list") or []
+    if not steps:
+        return []
+    offset = int(forecast.get("city", {}).get("timezone", 0))
+
+    dt = np.array([s["dt"] for s in steps], dtype=np.int64)
+    order = np.argsort(dt, kind="stable")
+    values = np.array([
+        [
+            s["main"]["temp"], s["main"].get("temp_min", s["main"]["temp"]),
+            s["main"].get("temp_max", s["main"]["temp"]), s["main"].get("humidity", 0),
+            s.get("wind", {}).get("speed", 0), s.get("pop", 0)
+        ]
+        for s in steps
+    ], dtype=np.float64)[order]
+    day = (dt[order] + offset) // SECONDS_PER_DAY
+    starts = _day_starts(day)
+    counts = np.diff(np.r_[starts, len(day)])
+
+    means = np.add.reduceat(values, starts, axis=0) / counts[:, None]
+    mins = np.minimum.reduceat(values, starts, axis=0)
+    maxs = np.maximum.reduceat(values, starts, axis=0)
+
+    # Dominant condition per day: tally condition codes per (day, condition)
+    labels = np.array([s["weather"][0]["main"] for s in steps])[order]
+    conditions, codes = np.unique(labels, return_inverse=True)
+    tally = np.zeros((len(starts), len(conditions)), dtype=np.int64)
+    np.add.at(tally, (np.repeat(np.arange(len(starts)), counts), codes), 1)
+    dominant = conditions[tally.argmax(axis=1)]
+
+    worst_aqi: Dict[int, tuple] = {}
+    samples = pollution.get("list") or []
+    if samples:
+        pdt = np.array([s["dt"] for s in samples], dtype=np.int64)
+        porder = np.argsort(pdt, kind="stable")
+        pvalues = np.array([
+            [s["main"]["aqi"], s.get("components", {}).get("pm2_5", 0)] for s in samples
+        ], dtype=np.float64)[porder]
+        pday = (pdt[porder] + offset) // SECONDS_PER_DAY
+        pstarts = _day_starts(pday)
+        pmax = np.maximum.reduceat(pvalues, pstarts, axis=0)
+        worst_aqi = {
+            int(d): (int(aqi), float(pm2_5))
+            for d, (aqi, pm2_5) in zip(pday[pstarts], pmax)
+        }
+
+    days = []
+    for i, d in enumerate(day[starts].tolist()):
+        aqi, pm2_5 = worst_aqi.get(d, (None, None))
+        days.append({
+            "date": datetime.date.fromordinal(
+                datetime.date(1970, 1, 1).toordinal() + d
+            ).isoformat(),
+            "temp_min": round(float(mins[i, TEMP_MIN]), 1),
+            "temp_max": round(float(maxs[i, TEMP_MAX]), 1),
+            "temp_mean": round(float(means[i, TEMP]), 1),
+            "humidity": round(float(means[i, HUMIDITY])),
+            "wind_max": round(float(maxs[i, WIND]), 1),
+            "precipitation_chance": round(float(maxs[i, POP]), 2),
+            "condition": str(dominant[i]),
+            "aqi": aqi,
+            "level": categorize_aqi(aqi) if aqi is not None else None,
+            "pm2_5_max": round(pm2_5, 1) if pm2_5 is not None else None
+        })
+    return days
+
+
+class ForecastService:
+    """Daily trip forecasts from OpenWeather's 5-day/3-hour and air-pollution forecasts.
+
+    The city is geocoded once and both forecasts are fetched concurrently.
+    The aggregated days for the whole forecast window are cached per city;
+    `get_trip` slices the requested range out of them.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, geocoder: GeocodeService,
+                 cache: Optional[TTLCache] = None, guard: Optional[UpstreamGuard] = None):
+        self.api_key = os.getenv("OPENWEATHER_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("Missing OPENWEATHER_API_KEY in .env")
+        self.base_url = f"{OPENWEATHER_BASE_URL}/data/2.5"
+        self.client = client
+        self.geocoder = geocoder
+        self.cache = cache
+        self.guard = guard or UpstreamGuard(failure_threshold=0)
+
+    async def get_daily_forecast(self, city: str) -> Dict[str, Any]:
+        """Aggregated days for the full forecast window, from the TTL cache when configured"""
+        if self.cache is None:
+            return await self._fetch_daily_forecast(city)
+        return await self.cache.get_or_fetch(
+            normalize_city(city), lambda: self._fetch_daily_forecast(city)
+        )
+
+    async def get_trip(self, city: str, start: Optional[datetime.date], days: int) -> Dict[str, Any]:
+        """Forecast days for [start, start + days). Raises 400 if none are covered."""
+        forecast = await self.get_daily_forecast(city)
+        if start is None:
+            start = datetime.date.fromisoformat(forecast["today"])
+        end = start + datetime.timedelta(days=days - 1)
+        selected = [
+            day for day in forecast["days"]
+            if start.isoformat() <= day["date"] <= end.isoformat()
+        ]
+        if not selected:
+            available = forecast["days"]
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"No forecast for {start.isoformat()} to {end.isoformat()}; "
+                    f"forecasts cover {available[0]['date']} to {available[-1]['date']}"
+                    if available else "No forecast data available"
+                )
+            )
+        trip = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "partial": len(selected) < days,
+            "days": selected
+        }
+        if forecast.get("stale"):
+            # last-known-good forecast served while upstream is unavailable
+            trip.update(stale=True, age_seconds=forecast["age_seconds"])
+        return trip
+
+    async def _fetch_daily_forecast(self, city: str) -> Dict[str, Any]:
+        try:
+            lat, lon = await self.geocoder.resolve(city)
+            with timed("forecast"):
+                forecast, pollution = await asyncio.gather(
+                    self._get_json("forecast", f"{self.base_url}/forecast",
+                                   {"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"}),
+                    self._get_json("air_pollution_forecast", f"{self.base_url}/air_pollution/forecast",
+                                   {"lat": lat, "lon": lon, "appid": self.api_key})
+                )
+            with timed("forecast_aggregate"):
+                days = aggregate_daily(forecast, pollution)
+            offset = int(forecast.get("city", {}).get("timezone", 0))
+            today = datetime.datetime.now(datetime.timezone(datetime.timedelta(seconds=offset))).date()
+            return {"today": today.isoformat(), "days": days}
+        except HTTPException:
+            raise
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
+                detail="Forecast API request timed out"
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Forecast API connection failed: {str(e)}"
+            )
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Malformed forecast API response: {str(e)}"
+            )
+
+    async def _get_json(self, endpoint: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await self.guard.call(
+                endpoint, lambda: self.client.get(url, params=params, timeout=10)
+            )
+        except httpx.TimeoutException:
+            record_upstream_error(endpoint, "timeout")
+            raise
+        except httpx.HTTPError:
+            record_upstream_error(endpoint, "connection_error")
+            raise
+        if response.status_code != 200:
+            record_upstream_error(endpoint, response.status_code)
+            if response.status_code == 401:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid OpenWeather API key - check https://openweathermap.org/faq#error401"
+                )
+            raise HTTPException(
+                status_code=502,
+                detail=f"Forecast API error ({endpoint}): HTTP {response.status_code}"
+            )
+        data = response.json()
+        log_payload(logger, f"Raw {endpoint} API Response", data)
+        return data
@@ -0,0 +1,201 @@
+import asyncio
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+from services.cache import normalize_city
+from services.http import OPENWEATHER_BASE_URL
+from services.metrics import record_cache, record_upstream_error, timed
+from services.upstream_guard import UpstreamGuard
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+GEOCODE_DB_PATH = os.getenv("GEOCODE_DB_PATH", str(DATA_DIR / "geocode.sqlite3"))
+GEOCODE_GAZETTEER_PATH = os.getenv("GEOCODE_GAZETTEER_PATH")
+# How long a name the geocoding API didn't know is answered with 404 locally
+GEOCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_NEGATIVE_TTL_SECONDS", "86400"))
+
+
+class GeocodeService:
+    """Resolves a city name to (lat, lon) once and remembers it.
+
+    Lookups go through an in-process dict, then a SQLite table on disk, and
+    only then to the OpenWeather geocoding API. Coordinates practically never
+    change, so resolved cities are kept forever and survive restarts. Names
+    the API doesn't know are remembered too (for GEOCODE_NEGATIVE_TTL_SECONDS),
+    so a repeated typo is rejected without another round trip. `suggest`
+    (e.g. CityStore.suggestions) adds "did you mean" names to those 404s.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, db_path: str = GEOCODE_DB_PATH,
+                 gazetteer_path: Optional[str] = GEOCODE_GAZETTEER_PATH,
+                 guard: Optional[UpstreamGuard] = None,
+                 suggest: Optional[Callable[[str], List[str]]] = None):
+        self.api_key = os.getenv("OPENWEATHER_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("Missing OPENWEATHER_API_KEY in .env")
+        self.geocode_url = f"{OPENWEATHER_BASE_URL}/geo/1.0/direct"
+        self.client = client
+        self.guard = guard or UpstreamGuard(failure_threshold=0)
+        self.suggest = suggest
+        self.db_path = db_path
+        self._coords: Dict[str, Tuple[float, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._db_lock = threading.Lock()
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS coordinates ("
+            "city TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS unknown_cities ("
+            "city TEXT PRIMARY KEY, checked_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        if gazetteer_path:
+            self.preload(gazetteer_path)
+
+    def preload(self, path: str) -> int:
+        """Load a `name,lat,lon` CSV gazetteer into the store. Returns rows loaded."""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [
+                (normalize_city(row["name"]), float(row["lat"]), float(row["lon"]))
+                for row in csv.DictReader(f)
+            ]
+        self.preload_coordinates(rows)
+        logger.info("Geocode store preloaded with %d cities from %s", len(rows), path)
+        return len(rows)
+
+    def preload_coordinates(self, rows: list) -> None:
+        """Remember (name, lat, lon) rows, e.g. from the city store, so they never hit the API."""
+        rows = [(normalize_city(name), lat, lon) for name, lat, lon in rows]
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO coordinates (city, lat, lon) VALUES (?, ?, ?)", rows
+            )
+            self._db.commit()
+        for city, lat, lon in rows:
+            self._coords[city] = (lat, lon)
+
+    async def resolve(self, city: str) -> Tuple[float, float]:
+        """Return (lat, lon) for a city; concurrent lookups share one resolution."""
+        key = normalize_city(city)
+        coords = self._coords.get(key)
+        if coords is not None:
+            record_cache("geocode", "hit")
+            return coords
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._resolve_uncached(key, city))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _resolve_uncached(self, key: str, city: str) -> Tuple[float, float]:
+        coords = await asyncio.to_thread(self._load, key)
+        if coords is not None:
+            record_cache("geocode", "store_hit")
+        elif await asyncio.to_thread(self._known_unknown, key):
+            record_cache("geocode", "negative_hit")
+            raise self._not_found(city)
+        else:
+            record_cache("geocode", "miss")
+            try:
+                coords = await self._fetch_coordinates(city)
+            except HTTPException as e:
+                if e.status_code == 404:
+                    await asyncio.to_thread(self._store_unknown, key)
+                raise
+            await asyncio.to_thread(self._store, key, coords)
+        self._coords[key] = coords
+        return coords
+
+    def _not_found(self, city: str) -> HTTPException:
+        suggestions = self.suggest(city) if self.suggest is not None else []
+        return HTTPException(
+            status_code=404,
+            detail=f"City '{city}' not found"
+            + (f"; did you mean {', '.join(suggestions)}?" if suggestions else "")
+        )
+
+    def _load(self, key: str) -> Optional[Tuple[float, float]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT lat, lon FROM coordinates WHERE city = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _store(self, key: str, coords: Tuple[float, float]) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO coordinates (city, lat, lon) VALUES (?, ?, ?)",
+                (key, coords[0], coords[1])
+            )
+            self._db.commit()
+
+    def _known_unknown(self, key: str) -> bool:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT checked_at FROM unknown_cities WHERE city = ?", (key,)
+            ).fetchone()
+        return row is not None and time.time() - row[0] < GEOCODE_NEGATIVE_TTL_SECONDS
+
+    def _store_unknown(self, key: str) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO unknown_cities (city, checked_at) VALUES (?, ?)",
+                (key, time.time())
+            )
+            self._db.commit()
+
+    async def _fetch_coordinates(self, city: str) -> Tuple[float, float]:
+        """Ask the OpenWeather geocoding API for a city's coordinates"""
+        try:
+            with timed("geocode"):
+                response = await self.guard.call("geocode", lambda: self.client.get(
+                    self.geocode_url,
+                    params={"q": city, "limit": 1, "appid": self.api_key},
+                    timeout=5
+                ))
+            if response.status_code != 200:
+                record_upstream_error("geocode", response.status_code)
+            data = response.json()
+            if response.status_code == 401:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid OpenWeather API key - check https://openweathermap.org/faq#error401"
+                )
+            if not data:
+                raise self._not_found(city)
+            return data[0]['lat'], data[0]['lon']
+        except HTTPException:
+            raise
+        except Exception as e:
+            if isinstance(e, httpx.HTTPError):
+                record_upstream_error(
+                    "geocode",
+                    "timeout" if isinstance(e, httpx.TimeoutException) else "connection_error"
+                )
+            raise HTTPException(
+                status_code=502,
+                detail=f"Geocoding failed: {str(e)}"
+            )
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,21 @@
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Override to point the services at a local stand-in (see benchmarks/fake_upstreams.py)
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+
+# Shared connection pool limits for all upstream (OpenWeather) calls
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the pooled async HTTP client shared by the upstream services.
+
+    One client is created per app lifespan so keep-alive connections to
+    OpenWeather are reused across requests instead of re-handshaking each time.
+    """
+    return httpx.AsyncClient(limits=DEFAULT_LIMITS, timeout=DEFAULT_TIMEOUT)
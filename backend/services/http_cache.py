@@ -0,0 +1,49 @@
+"""HTTP caching helpers: content-hash ETags, conditional requests and Cache-Control."""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def cache_control(max_age: int, stale_while_revalidate: int = 0, public: bool = True,
+                  immutable: bool = False) -> str:
+    parts = ["public" if public else "private", f"max-age={max(0, int(max_age))}"]
+    if stale_while_revalidate > 0:
+        parts.append(f"stale-while-revalidate={int(stale_while_revalidate)}")
+    if immutable:
+        parts.append("immutable")
+    return ", ".join(parts)
+
+
+def conditional_response(request: Request, body: bytes, media_type: str,
+                         headers: Dict[str, str], etag: Optional[str] = None) -> Response:
+    """`body` with an ETag, or an empty 304 if the client already holds it."""
+    headers = {**headers, "ETag": etag or etag_for(body)}
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def json_response(request: Request, payload: Any, cache_control_header: str) -> Response:
+    """Serialize `payload` once and answer with a content-hash ETag (304 if unchanged)."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return conditional_response(
+        request, body, "application/json", {"Cache-Control": cache_control_header}
+    )
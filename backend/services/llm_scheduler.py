@@ -0,0 +1,82 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class LLMOverloaded(Exception):
+    """Raised when a generation can't be admitted (queue full or deadline unreachable)."""
+
+
+class LLMScheduler:
+    """Bounds concurrent LLM generations and the queue of requests waiting for one.
+
+    Callers run their generation inside `with scheduler.slot(deadline):`.
+    Admission fails fast with LLMOverloaded when the wait queue is full, or
+    when the request's deadline (a time.monotonic() value) would be missed
+    given the recent average generation time.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 8,
+                 initial_estimate: float = 5.0, smoothing: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.estimate = initial_estimate
+        self.smoothing = smoothing
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None) -> Iterator[None]:
+        self._acquire(deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def _acquire(self, deadline: Optional[float]) -> None:
+        with self._cond:
+            if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise LLMOverloaded("LLM queue is full")
+            self.waiting += 1
+            try:
+                while True:
+                    remaining = None
+                    # checked even when a slot is free: a generation that can't
+                    # finish in time should degrade now rather than run late
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic() - self.estimate
+                        if remaining <= 0:
+                            self.rejected += 1
+                            # we may have consumed the wakeup meant for a slot; pass it on
+                            self._cond.notify()
+                            raise LLMOverloaded("LLM deadline would be missed")
+                    if self.active < self.max_concurrency:
+                        break
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+
+    def _release(self, duration: float) -> None:
+        with self._cond:
+            self.active -= 1
+            self.completed += 1
+            # exponentially weighted average of recent generation times
+            self.estimate += self.smoothing * (duration - self.estimate)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "estimate_seconds": self.estimate,
+            }
@@ -0,0 +1,47 @@
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of upstream responses whose raw payload is logged at DEBUG level
+DEBUG_PAYLOAD_SAMPLE_RATE = float(os.getenv("DEBUG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+_listener = None
+
+
+def setup_logging() -> None:
+    """Route all log records through a queue so formatting and stdout I/O
+    happen on a background thread instead of the request path."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+
+def _restart_after_fork() -> None:
+    # the listener thread doesn't exist in a forked worker; start a fresh one
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def log_payload(logger: logging.Logger, label: str, payload) -> None:
+    """Log a raw upstream payload, only at DEBUG level and only for a sample of calls."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_PAYLOAD_SAMPLE_RATE:
+        logger.debug("%s: %s", label, payload)
@@ -0,0 +1,94 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Latency of each stage of a guide request
+STAGE_LATENCY = Histogram(
+    "travelbuddy_stage_seconds",
+    "Latency of each guide request stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+# Upstream (OpenWeather / Ollama) failures by endpoint and status code
+UPSTREAM_ERRORS = Counter(
+    "travelbuddy_upstream_errors_total",
+    "Failed upstream calls",
+    ["endpoint", "status"]
+)
+
+# Cache lookups by cache name and result (hit / stale / miss / last_known_good)
+CACHE_REQUESTS = Counter(
+    "travelbuddy_cache_requests_total",
+    "Cache lookups",
+    ["cache", "result"]
+)
+
+# Upstream calls refused locally, by endpoint and reason (rate_limited / circuit_open)
+UPSTREAM_REJECTED = Counter(
+    "travelbuddy_upstream_rejected_total",
+    "Upstream calls refused before being sent",
+    ["endpoint", "reason"]
+)
+
+# 1 while an endpoint's circuit breaker is open (in any live worker: breakers are per process)
+CIRCUIT_OPEN = Gauge(
+    "travelbuddy_circuit_open",
+    "Whether an upstream endpoint's circuit breaker is open",
+    ["endpoint"],
+    multiprocess_mode="livemax"
+)
+
+# Packing answers that fell back to retrieval-only, by reason
+PACKING_DEGRADED = Counter(
+    "travelbuddy_packing_degraded_total",
+    "Packing answers served without the LLM",
+    ["reason"]
+)
+
+# How each packing retrieval was answered: facet_exact (metadata lookup only),
+# facet_rerank (vector rerank over facet candidates) or vector (full search)
+PACKING_RETRIEVAL = Counter(
+    "travelbuddy_packing_retrieval_total",
+    "Packing retrievals by path",
+    ["path"]
+)
+
+
+# Background pre-warm work, by kind (weather / aqi / packing) and result
+PREWARM_JOBS = Counter(
+    "travelbuddy_prewarm_jobs_total",
+    "Background refreshes of hot cities",
+    ["kind", "result"]
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the wall time of the enclosed block under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def exposition() -> bytes:
+    """Body of /metrics. Under gunicorn (PROMETHEUS_MULTIPROC_DIR set, see
+    gunicorn.conf.py) every worker's samples are merged, not just this one's."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def record_cache(cache: str, result: str) -> None:
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def record_upstream_error(endpoint: str, status) -> None:
+    UPSTREAM_ERRORS.labels(endpoint, str(status)).inc()
@@ -1,238 +1,378 @@
 # services/packing.py
 import ollama
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
+import logging
+import os
+import queue
 import re
-
-# Initialize the embedder and index (these will be loaded once when the service starts)
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Define your corpus of documents (same as in your packing.py)
-documents = [
-    # Beach Destinations
-    "For a beach trip with hot weather and good air quality, pack: sunscreen, swimsuit, sunglasses, hat, beach towel, flip-flops, reusable water bottle, waterproof phone case.",
-    "For a beach trip with hot weather and moderate air quality, pack: sunscreen, swimsuit, sunglasses, hat, beach towel, flip-flops, reusable water bottle, N95 mask (for dust).",
-    "For a beach trip with hot weather and unhealthy air quality, pack: sunscreen, swimsuit, sunglasses, hat, beach towel, flip-flops, reusable water bottle, N95 mask (for smoke/dust), portable air purifier.",
-    "For a beach trip with mild weather and good air quality, pack: light jacket, swimsuit, sunscreen, sunglasses, beach towel, sneakers, reusable water bottle.",
-    "For a beach trip with mild weather and moderate air quality, pack: light jacket, swimsuit, sunscreen, sunglasses, beach towel, sneakers, reusable water bottle, N95 mask (for pollen).",
-    "For a beach trip with mild weather and unhealthy air quality, pack: light jacket, swimsuit, sunscreen, sunglasses, beach towel, sneakers, reusable water bottle, N95 mask (for pollution), portable air purifier.",
-    "For a beach trip with cold weather and good air quality, pack: warm jacket, swimsuit (for hot springs), sunscreen, beanie, gloves, thermal socks, reusable water bottle.",
-    "For a beach trip with cold weather and moderate air quality, pack: warm jacket, swimsuit (for hot springs), sunscreen, beanie, gloves, thermal socks, reusable water bottle, N95 mask (for windborne dust).",
-    "For a beach trip with cold weather and unhealthy air quality, pack: warm jacket, swimsuit (for hot springs), sunscreen, beanie, gloves, thermal socks, reusable water bottle, N95 mask (for pollution), portable air purifier.",
-
-    # City Destinations
-    "For a city trip with hot weather and good air quality, pack: light clothing, comfortable walking shoes, sunglasses, hat, reusable water bottle, portable fan, power bank.",
-    "For a city trip with hot weather and moderate air quality, pack: light clothing, comfortable walking shoes, sunglasses, hat, reusable water bottle, N95 mask (for traffic fumes), portable fan.",
-    "For a city trip with hot weather and unhealthy air quality, pack: light clothing, comfortable walking shoes, sunglasses, hat, reusable water bottle, N95 mask (for smog), portable air purifier, electrolyte tablets.",
-    "For a city trip with mild weather and good air quality, pack: light layers, comfortable walking shoes, compact umbrella, reusable water bottle, power bank, city guidebook.",
-    "For a city trip with mild weather and moderate air quality, pack: light layers, comfortable walking shoes, compact umbrella, reusable water bottle, N95 mask (for pollen), power bank.",
-    "For a city trip with mild weather and unhealthy air quality, pack: light layers, comfortable walking shoes, compact umbrella, reusable water bottle, N95 mask (for pollution), portable air purifier.",
-    "For a city trip with cold weather and good air quality, pack: warm coat, thermal layers, gloves, beanie, waterproof boots, reusable water bottle, hand warmers.",
-    "For a city trip with cold weather and moderate air quality, pack: warm coat, thermal layers, gloves, beanie, waterproof boots, reusable water bottle, N95 mask (for cold-induced smog).",
-    "For a city trip with cold weather and unhealthy air quality, pack: warm coat, thermal layers, gloves, beanie, waterproof boots, reusable water bottle, N95 mask (for pollution), portable air purifier.",
-
-    # Mountain/Hiking Destinations
-    "For a mountain trip with hot weather and good air quality, pack: hiking boots, moisture-wicking clothes, wide-brim hat, sunscreen, trekking poles, hydration bladder, insect repellent.",
-    "For a mountain trip with hot weather and moderate air quality, pack: hiking boots, moisture-wicking clothes, wide-brim hat, sunscreen, trekking poles, hydration bladder, N95 mask (for dust).",
-    "For a mountain trip with hot weather and unhealthy air quality, pack: hiking boots, moisture-wicking clothes, wide-brim hat, sunscreen, trekking poles, hydration bladder, N95 mask (for wildfire smoke), portable oxygen canister.",
-    "For a mountain trip with mild weather and good air quality, pack: layered clothing, hiking boots, rain jacket, sunscreen, trekking poles, hydration bladder, first-aid kit.",
-    "For a mountain trip with mild weather and moderate air quality, pack: layered clothing, hiking boots, rain jacket, sunscreen, trekking poles, hydration bladder, N95 mask (for pollen).",
-    "For a mountain trip with mild weather and unhealthy air quality, pack: layered clothing, hiking boots, rain jacket, sunscreen, trekking poles, hydration bladder, N95 mask (for smoke), portable oxygen canister.",
-    "For a mountain trip with cold weather and good air quality, pack: insulated jacket, thermal base layers, gloves, beanie, waterproof boots, hand warmers, hydration bladder (insulated).",
-    "For a mountain trip with cold weather and moderate air quality, pack: insulated jacket, thermal base layers, gloves, beanie, waterproof boots, hand warmers, hydration bladder (insulated), N95 mask (for cold air).",
-    "For a mountain trip with cold weather and unhealthy air quality, pack: insulated jacket, thermal base layers, gloves, beanie, waterproof boots, hand warmers, hydration bladder (insulated), N95 mask (for pollution), portable oxygen canister.",
-
-    # Desert Destinations
-    "For a desert trip with hot weather and good air quality, pack: loose, long-sleeved clothing, wide-brim hat, sunglasses, SPF 50+ sunscreen, electrolyte tablets, hydration pack, cooling towel.",
-    "For a desert trip with hot weather and moderate air quality, pack: loose, long-sleeved clothing, wide-brim hat, sunglasses, SPF 50+ sunscreen, electrolyte tablets, hydration pack, N95 mask (for sandstorms).",
-    "For a desert trip with hot weather and unhealthy air quality, pack: loose, long-sleeved clothing, wide-brim hat, sunglasses, SPF 50+ sunscreen, electrolyte tablets, hydration pack, N95 mask (for dust storms), portable air purifier.",
-    "For a desert trip with mild weather and good air quality, pack: layered clothing, wide-brim hat, sunglasses, sunscreen, reusable water bottle, lightweight scarf (for wind).",
-    "For a desert trip with mild weather and moderate air quality, pack: layered clothing, wide-brim hat, sunglasses, sunscreen, reusable water bottle, N95 mask (for dust).",
-    "For a desert trip with mild weather and unhealthy air quality, pack: layered clothing, wide-brim hat, sunglasses, sunscreen, reusable water bottle, N95 mask (for pollution), portable air purifier.",
-    "For a desert trip with cold weather and good air quality, pack: insulated jacket, thermal layers, gloves, beanie, sunglasses, sunscreen, reusable water bottle (insulated).",
-    "For a desert trip with cold weather and moderate air quality, pack: insulated jacket, thermal layers, gloves, beanie, sunglasses, sunscreen, reusable water bottle (insulated), N95 mask (for cold wind).",
-    "For a desert trip with cold weather and unhealthy air quality, pack: insulated jacket, thermal layers, gloves, beanie, sunglasses, sunscreen, reusable water bottle (insulated), N95 mask (for pollution), portable air purifier.",
-
-    # France (Paris)
-    "For a city trip to Paris with mild weather and good air quality, pack: stylish scarf (for chic looks), compact umbrella (for sudden rain), comfortable walking shoes (for cobblestones), reusable coffee cup (for café culture), Seine river cruise ticket.",
-    "For a city trip to Paris with cold weather and moderate air quality, pack: trench coat, leather gloves, beret (for fashion + warmth), portable espresso maker (French coffee is strong!), anti-theft crossbody bag (for crowded metros).",
-
-    # Japan (Tokyo)
-    "For a city trip to Tokyo with hot weather and good air quality, pack: portable fan (for humid summers), coin purse (many vending machines), slip-on shoes (for temples/ryokans), pocket WiFi router, handkerchief (public restrooms often lack paper towels).",
-    "For a city trip to Tokyo with cold weather and moderate air quality, pack: heat-tech innerwear (Uniqlo-style), face mask (for pollen/etiquette), IC card (Suica/Pasmo), onsen towel (for public baths), portable charger (for all-day sightseeing).",
-
-    # Italy (Rome)
-    "For a city trip to Rome with hot weather and good air quality, pack: sun hat (for no-shade ruins), refillable water bottle (for public fountains), modest clothing (for Vatican visits), gelato map (to find artisanal spots), anti-pickpocket belt bag.",
-    "For a city trip to Rome with mild weather and moderate air quality, pack: light shawl (for church dress codes), comfortable sandals (for uneven streets), Italian phrasebook, wine stopper (for leftover Chianti), collapsible shopping bag (for markets).",
-
-    # India (Delhi)
-    "For a city trip to Delhi with hot weather and unhealthy air quality, pack: N99 pollution mask, hand sanitizer (street food prep), scarf (for dust/sun), electrolyte sachets (for dehydration), portable bidet (many restrooms lack TP).",
-    "For a city trip to Delhi with mild weather and moderate air quality, pack: modest clothing (for cultural sites), wet wipes, power adapter (Type D), digestive tablets (for spice adjustment), cheap smartphone (to avoid theft risk).",
-
-    # Thailand (Bangkok)
-    "For a city trip to Bangkok with hot weather and moderate air quality, pack: sweat-wicking fabrics, foldable fan, reef-safe sunscreen (for island hops), Thai Baht coins (for tuk-tuks), bum bag (for night markets).",
-    "For a city trip to Bangkok with mild weather and good air quality, pack: long pants (for temple visits), mosquito repellent, Grab app pre-downloaded (like Uber), quick-dry towel, portable stain remover (for street food spills).",
-
-    # USA (New York)
-    "For a city trip to New York with cold weather and moderate air quality, pack: thermal socks (for long walks), MetroCard, reusable bag (for 5¢ bag fee), Broadway ticket printouts, portable phone charger (for subway dead zones).",
-    "For a city trip to New York with hot weather and good air quality, pack: sunglasses (for skyscraper glare), walking shoes (no car needed), deli sandwich map (for iconic spots), foldable tote (for impulsive shopping).",
-
-    # Egypt (Cairo)
-    "For a desert trip to Cairo with hot weather and unhealthy air quality, pack: UV-protection scarf, Egypt visa printout, USD small bills (for bribes/tips), portable fan (for pyramid climbs), wet wipes (for sand).",
-    "For a city trip to Cairo with mild weather and moderate air quality, pack: conservative clothing, hieroglyphic guidebook, cheap sunglasses (for souvenir haggling), stomach meds (for ‘Pharaoh’s Revenge’), power bank (for spotty electricity).",
-
-    # Brazil (Rio de Janeiro)
-    "For a beach trip to Rio with hot weather and good air quality, pack: Havaianas flip-flops, waterproof phone pouch (for beaches), Portuguese phrasebook, anti-theft beach bag, caipirinha recipe card (to impress locals).",
-    "For a city trip to Rio with mild weather and moderate air quality, pack: light rain jacket (for sudden showers), FIFA jersey (for football culture), transit card (for buses), portable speaker (for beach samba), bug spray (for dengue risk).",
-
-    # Australia (Sydney)
-    "For a beach trip to Sydney with hot weather and good air quality, pack: rash guard (for jellyfish), Opal transit card, reef-safe sunscreen (required by law), Aussie slang cheat sheet, collapsible cooler (for BYO barbies).",
-    "For a city trip to Sydney with mild weather and moderate air quality, pack: layered clothing (for 4 seasons/day), VPN app (for geo-blocked content), coffee keep-cup (for flat whites), sunscreen stick (for reapplication).",
-
-    # Morocco (Marrakech)
-    "For a desert trip to Marrakech with hot weather and moderate air quality, pack: loose linen pants (for conservative areas), dirham coins (for haggling), saffron-buying guide, scarf (for sandstorms), flip-flops (for hammams).",
-    "For a city trip to Marrakech with mild weather and good air quality, pack: tea set (to gift hosts), GPS offline maps (for medina maze), antihistamines (for spice dust), lantern (for romantic riads), mint leaves (for DIY tea).",
-
-    # Spain (Barcelona)
-    "For a city trip to Barcelona with hot weather and good air quality, pack: modesty cover-up (for Sagrada Família), espadrilles (local footwear), reusable water bottle (for public fountains), paella restaurant map, anti-theft backpack (for Las Ramblas).",
-    "For a beach trip to Barcelona with mild weather and moderate air quality, pack: UV-protective swim shirt (for strong sun), Catalan phrasebook, tapas tour app, foldable picnic blanket (for beach paella), silicone wine pouch (for sangria).",
-
-    # Turkey (Istanbul)
-    "For a city trip to Istanbul with mild weather and moderate air quality, pack: headscarf (for mosque visits), Turkish Lira coins (for tram rides), portable tea infuser (for çay), evil eye charm (souvenir/haggle starter), stain remover pen (for kebabs).",
-    "For a city trip to Istanbul with cold weather and unhealthy air quality, pack: thermal socks (for cold marble floors), VPN app (for social media bans), baklava gift box (for hosts), hammam towel, N95 mask (for winter smog).",
-
-    # Vietnam (Hanoi)
-    "For a city trip to Hanoi with hot weather and unhealthy air quality, pack: motorbike bandana (for pollution), zippered pouch (for street food dong), pho spice kit, quick-dry clothing (for humidity), portable stool (for plastic-chair cafes).",
-    "For a countryside trip to Sapa with mild weather and good air quality, pack: trekking sandals (for rice terraces), ethnic textile bag (support locals), insect-repellent bracelets, rain poncho (for sudden showers), homestay gift (school supplies).",
-
-    # Mexico (Mexico City)
-    "For a city trip to Mexico City with mild weather and moderate air quality, pack: Chapulín (grasshopper) snack pack, Metro card, Lucha Libre mask (for arena nights), stomach settlers (for spicy food), Spanish slang cheat sheet.",
-    "For a beach trip to Cancún with hot weather and good air quality, pack: reef-safe sunscreen (mandatory), waterproof money case (for cenotes), Mexican SIM card, tortilla warmer (for breakfast tacos), floating phone pouch (for pool parties).",
-
-    # South Africa (Cape Town)
-    "For a city trip to Cape Town with mild weather and good air quality, pack: windproof jacket (for Table Mountain), ZAR coins (for tips), braai (BBQ) spice kit, power adapter (Type D), offline maps (for spotty signal).",
-    "For a safari trip to Kruger with hot weather and moderate air quality, pack: khaki clothing (no bright colors), binoculars, anti-malaria pills, wildlife checklist book, solar charger (for lodges).",
-
-    # Indonesia (Bali)
-    "For a beach trip to Bali with hot weather and good air quality, pack: sarong (for temple visits), mosquito-repellent wristbands, waterproof sandals (for waterfalls), Balinese offering kit (for ceremonies), motorbike license (for rentals).",
-    "For a jungle trip to Ubud with mild weather and moderate air quality, pack: yoga mat strap, eco-friendly straw set, rice terrace map, herbal balm (for bug bites), portable bidet (for eco-toilets).",
-
-    # Greece (Athens)
-    "For a city trip to Athens with hot weather and good air quality, pack: ancient ruins guidebook, Greek coffee pot (briki), sun-protective hat (for Acropolis), olive oil shopping list, anti-slip sandals (for marble paths).",
-    "For an island trip to Santorini with mild weather and moderate air quality, pack: white outfit (for photos), volcanic wine tote bag, cliffside restaurant map, selfie stick (for caldera views), seasickness pills (for ferry rides).",
-
-    # Portugal (Lisbon)
-    "For a city trip to Lisbon with mild weather and good air quality, pack: tram route map, cork products (souvenirs), pastel de nata thermal bag (for takeaway), fado music playlist, cushioned shoes (for cobblestone hills).",
-    "For a beach trip to Algarve with hot weather and moderate air quality, pack: cliff-jumping water shoes, sardine can souvenirs, Algarvian citrus perfume, tide timetable (for cave tours), EU health card (for free healthcare).",
-
-    # Argentina (Buenos Aires)
-    "For a city trip to Buenos Aires with mild weather and moderate air quality, pack: mate gourd set, tango shoe protectors, USD bills (for blue market rate), steakhouse map, portable fan (for non-AC spots).",
-    "For a Patagonia trip with cold weather and good air quality, pack: windproof gloves, thermal base layers, hiking gaiters, dulce de leche stash, Spanish geology guidebook.",
-
-    # Peru (Lima)
-    "For a city trip to Lima with mild weather and moderate air quality, pack: ceviche restaurant guide, altitude sickness pills (for Andes trips), alpaca wool gloves, Pisco sour kit, waterproof bag (for coastal fog).",
-    "For a Machu Picchu trek with cold weather and good air quality, pack: Inca Trail permit printout, coca tea bags, hiking poles, biodegradable wet wipes, Quechua phrasebook.",
-
-    # **United Arab Emirates (Dubai)**
-    "For a city trip to Dubai with hot weather and unhealthy air quality, pack: modesty scarf (for mosques), UV-blocking sunglasses (for desert glare), gold souk bargaining guide, portable fan (for outdoor malls), Emirates ID copy (for SIM card).",
-    "For a desert safari in Dubai with mild weather and moderate air quality, pack: sand-proof phone case, Arabic coffee gift set (for Bedouin hosts), cooling neck wrap, 4x4 car charger, dune-bashing motion sickness pills.",
-
-    # **Malaysia (Kuala Lumpur)**
-    "For a city trip to Kuala Lumpur with hot weather and unhealthy air quality, pack: mosquito-repellent socks (for dengue zones), MYR small bills (for street food), portable prayer mat (for mosque visits), durian breath mints, Grab app pre-downloaded.",
-    "For a rainforest trip to Borneo with mild weather and good air quality, pack: leech socks, waterproof binoculars, orangutan adoption certificate (for sanctuary visits), headlamp (for night hikes), biodegradable soap.",
-
-    # **Philippines (Palawan)**
-    "For a beach trip to Palawan with hot weather and good air quality, pack: waterproof dry bag (for island hopping), Filipino phrasebook (for remote villages), reef-safe sunscreen (for coral protection), halo-halo recipe card, anti-chafing powder.",
-    "For a city trip to Manila with mild weather and unhealthy air quality, pack: pollution mask (N95), Jeepney fare cheat sheet, power bank (for brownouts), sinigang soup mix, umbrella (for sudden downpours).",
-
-    # **Netherlands (Amsterdam)**
-    "For a city trip to Amsterdam with mild weather and moderate air quality, pack: bike phone mount (for rentals), canal cruise ticket printout, stroopwafel tote (for markets), portable bike lock, coffee shop etiquette guide.",
-    "For a countryside trip to Keukenhof with cold weather and good air quality, pack: tulip bulb shipping kit, rainproof clogs, windmill picnic blanket, Dutch cheese knife, thermal leggings (for bike tours).",
-
-    # **Singapore**
-    "For a city trip to Singapore with hot weather and moderate air quality, pack: chewing gum (forbidden—ironic souvenir), EZ-Link transit card, hawker center wet wipes, air-conditioned mall map, portable umbrella (for sudden storms).",
-    "For a Sentosa Island trip with mild weather and good air quality, pack: Universal Studios fast-pass printout, waterproof phone lanyard (for lazy river), chili crab bib, SGD coins (for vending machines), foldable water bottle.",
-
-    # **Ireland (Dublin)**
-    "For a city trip to Dublin with cold weather and moderate air quality, pack: Guinness brewery reservation, waterproof hiking boots (for Cliffs of Moher), Irish slang dictionary, wool sweater (for gift-giving), pub trivia cheat sheet.",
-    "For a countryside trip to Galway with mild weather and good air quality, pack: traditional music pub map, sheep-avoiding car horn, Connemara marble souvenir guide, rainproof poncho (for ‘soft days’), thermal flask (for tea stops).",
-
-    # **South Korea (Seoul)**
-    "For a city trip to Seoul with cold weather and unhealthy air quality, pack: K-beauty sample kit (for duty-free), T-money transit card, portable oxygen canister (for pollution), Korean BBQ marinade set, smartphone selfie ring light.",
-    "For a ski trip to Pyeongchang with mild weather and good air quality, pack: heated insoles, ski lift pass holder, kimchi thermos (for slopes), K-pop playlist (for apres-ski), skin moisturizer (for dry cold).",
-
-    # **Colombia (Bogotá)**
-    "For a city trip to Bogotá with mild weather and moderate air quality, pack: altitude sickness coca tea, emerald-buying guide, salsa dance shoes, arepa recipe card, theft-proof money belt (for crowded areas).",
-    "For a coffee region trip with hot weather and good air quality, pack: coffee bean vacuum bags, farmstay gift (school supplies), insect-repellent bandana, waterproof journal (for humid hikes), collapsible coffee dripper.",
-
-    # **New Zealand (Queenstown)**
-    "For an adventure trip to Queenstown with cold weather and good air quality, pack: bungee-jumping GoPro mount, merino wool base layers, hobbiton tour ticket, jet boat hair ties, NZ power adapter (Type I).",
-    "For a glacier hike in Franz Josef with mild weather and moderate air quality, pack: crampon-compatible boots, glacier sunscreen (high UV), Māori phrasebook, waterproof gloves, emergency locator beacon.",
-
-    # **Croatia (Dubrovnik)**
-    "For a city trip to Dubrovnik with hot weather and good air quality, pack: Game of Thrones filming map, seawater-proof sandals, Dalmatian wine tote, wall walk ticket (for sunrise), euro coins (for public toilets).",
-    "For an island-hopping trip with mild weather and moderate air quality, pack: quick-dry swimwear, olive oil shopping list, waterproof speaker (for boat parties), Croatian SIM card, seasickness wristbands."
-
-
-]
-
-# Create the FAISS index (done once at startup)
-index, faiss_embeddings = None, None
-
-def initialize_packing_service():
-    global index, faiss_embeddings
-    if index is None:
-        # Convert documents to embeddings
-        embeddings = embedder.encode(documents, show_progress_bar=True)
-        faiss_embeddings = np.array(embeddings).astype(np.float32)
-        index = faiss.IndexFlatL2(faiss_embeddings.shape[1])
-        index.add(faiss_embeddings)
-
-def search_query(query: str) -> str:
-    """Search for the most relevant packing suggestion."""
-    # Encode the query
-    query_embedding = embedder.encode([query])[0]
-    
-    # Search the FAISS index
-    D, I = index.search(np.array([query_embedding]).astype(np.float32), k=1)
-    
-    # Get the most relevant document
-    return documents[I[0][0]]
-
-def get_packing_suggestions(city: str, temperature: float, aqi: int) -> Dict[str, Any]:
-    """Get packing suggestions based on location, weather, and air quality."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from services.batcher import QueryBatcher
+from services.embedders import create_local_embedder, embedder_id
+from services.embedding_server import RemoteEmbedder
+from services.llm_scheduler import LLMOverloaded, LLMScheduler
+from services.metrics import PACKING_DEGRADED, PACKING_RETRIEVAL, record_upstream_error, timed
+from services.packing_cache import PackingResultCache
+from services.packing_facets import weather_band
+from services.packing_parser import PackingJSONStreamParser, PackingStreamParser, parse_packing_response
+from services.packing_index import (
+    PackingIndex,
+    corpus_signature,
+    load_corpus,
+    measure_recall,
+    sync_index
+)
+
+logger = logging.getLogger(__name__)
+
+# Prebuilt embeddings + FAISS index versions live here (see services/packing_index.py)
+INDEX_DIR = Path(os.getenv(
+    "PACKING_INDEX_DIR",
+    str(Path(__file__).resolve().parent.parent / "data" / "packing_index")
+))
+
+# The embedder is only loaded when a query actually needs encoding
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """Load the configured embedding backend on first use (see services/embedders.py).
+
+    With EMBEDDING_SOCKET set, queries are encoded by the shared embedding
+    process instead (see services/embedding_server.py).
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                socket_path = os.getenv("EMBEDDING_SOCKET")
+                if socket_path:
+                    _embedder = RemoteEmbedder(socket_path)
+                else:
+                    _embedder = create_local_embedder()
+    return _embedder
+
+# The corpus lives in JSONL files (see services/packing_index.py); the live
+# index snapshot is swapped atomically on reload so in-flight queries keep
+# using the one they started with
+packing_index: Optional[PackingIndex] = None
+_corpus_signature = None
+_index_lock = threading.Lock()
+
+def _encode_corpus(texts: list) -> np.ndarray:
+    return get_embedder().encode(texts, show_progress_bar=len(texts) > 100)
+
+def _sync(index_dir: Path) -> PackingIndex:
+    global _corpus_signature
+    signature = corpus_signature()
+    state = sync_index(
+        index_dir, load_corpus(), embedder_id(), _encode_corpus,
+        shared=bool(os.getenv("PACKING_INDEX_SHARED"))
+    )
+    _corpus_signature = signature
+    return state
+
+def initialize_packing_service(index_dir: Path = INDEX_DIR):
+    """Load the packing index (memory-mapped), building or updating it if the corpus changed."""
+    global packing_index
+    if packing_index is None:
+        with _index_lock:
+            if packing_index is None:
+                packing_index = _sync(index_dir)
+
+def reload_packing_corpus(index_dir: Path = INDEX_DIR) -> bool:
+    """Pick up corpus edits without a restart. Returns True if a new index went live."""
+    global packing_index
+    if packing_index is not None and corpus_signature() == _corpus_signature:
+        return False
+    with _index_lock:
+        state = _sync(index_dir)
+        changed = packing_index is None or state.version != packing_index.version
+        packing_index = state
+    if changed:
+        logger.info("Packing index %s is live (%d entries)", state.version, state.meta["count"])
+    return changed
+
+def _encode_queries(queries: list) -> np.ndarray:
+    with timed("query_embed"):
+        return get_embedder().encode(queries)
+
+def _search_vectors(vectors: np.ndarray, candidates: list) -> list:
+    """One batched search; returns the best document for each row.
+
+    Rows with facet candidates are reranked over just those entries; the
+    rest go through a single FAISS search of the whole index.
+    """
+    state = packing_index
+    best = [None] * len(vectors)
+    with timed("faiss_search"):
+        for row, ids in enumerate(candidates):
+            # ids from an older snapshot may have been removed by a reload since
+            ids = [i for i in ids or () if i in state.row_of]
+            if ids:
+                best[row] = state.rerank(vectors[row], ids)
+        full = [row for row, faiss_id in enumerate(best) if faiss_id is None]
+        if full:
+            D, I = state.search(np.ascontiguousarray(vectors[full]), k=1)
+            for row, faiss_id in zip(full, I[:, 0]):
+                best[row] = faiss_id
+    return state.texts(best)
+
+# Concurrent queries are encoded and searched together in micro-batches
+query_batcher = QueryBatcher(
+    encode=_encode_queries,
+    search=_search_vectors,
+    max_batch_size=int(os.getenv("PACKING_BATCH_MAX_SIZE", "32")),
+    max_wait=float(os.getenv("PACKING_BATCH_WAIT_MS", "5")) / 1000,
+    cache_size=int(os.getenv("PACKING_QUERY_CACHE_SIZE", "1024"))
+)
+
+def search_query(query: str, candidates: Optional[list] = None) -> str:
+    """Search for the most relevant packing suggestion, optionally among `candidates` only."""
+    return query_batcher.search(query, candidates)
+
+def search_queries(queries: list, candidates: Optional[list] = None) -> list:
+    """Search several queries at once; they share one encode/search batch."""
+    return query_batcher.search_many(queries, candidates)
+
+# `source` of answers the LLM actually generated (anything else is degraded)
+AI_SOURCE = "AI-generated based on travel knowledge base"
+
+# Parsed results keyed on (city, temperature band, AQI); a hit skips retrieval and the LLM
+packing_cache = PackingResultCache()
+
+def build_query(city: str, temperature: float, aqi: int) -> str:
+    """Create a query based on the input parameters"""
+    return (
+        f"Provide packing suggestions for a trip to {city} "
+        f"with a temperature of {temperature}°C "
+        f"and an AQI of {aqi}. "
+        "Include both a packing list and travel tips."
+    )
+
+# Bounded, deadline-aware access to the local Ollama server
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "8"))
+)
+ollama_client = ollama.Client(timeout=float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "60")))
+
+# Generation profile: every call sends the same system prompt first (so Ollama
+# reuses its cached prefix), keeps the model loaded, caps the answer length
+# and constrains it to PACKING_SCHEMA.
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:latest")
+# Duration ("30m") or seconds; negative keeps the model loaded indefinitely
+_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+OLLAMA_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", "384"))
+
+PACKING_MAX_ITEMS = 12
+PACKING_MAX_TIPS = 5
+
+PACKING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "packing_list": {
+            "type": "array", "items": {"type": "string"}, "maxItems": PACKING_MAX_ITEMS
+        },
+        "travel_tips": {
+            "type": "array", "items": {"type": "string"}, "maxItems": PACKING_MAX_TIPS
+        }
+    },
+    "required": ["packing_list", "travel_tips"]
+}
+
+SYSTEM_PROMPT = (
+    "You are a travel packing assistant. The user message holds reference "
+    "packing notes followed by a question about a trip. Answer with a JSON "
+    'object with two arrays of short strings: "packing_list" (at most '
+    f'{PACKING_MAX_ITEMS} items to pack) and "travel_tips" (at most '
+    f"{PACKING_MAX_TIPS} practical tips for the weather and air quality). "
+    "Each entry is a few words, without numbering or explanations."
+)
+
+def _build_messages(document: str, query: str) -> list:
+    context = document + "\n\n" + "Question: " + query
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": context}
+    ]
+
+def _chat(messages: list, stream: bool = False):
+    return ollama_client.chat(
+        model=OLLAMA_MODEL,
+        messages=messages,
+        stream=stream,
+        format=PACKING_SCHEMA,
+        options={"num_predict": OLLAMA_NUM_PREDICT},
+        keep_alive=OLLAMA_KEEP_ALIVE
+    )
+
+def warm_up_llm() -> None:
+    """Load the model and prefill the system prompt, so the first request pays neither."""
     try:
-        # Initialize the service if not already done
-        initialize_packing_service()
-        
-        # Create a query based on the input parameters
-        query = (
-            f"Provide packing suggestions for a trip to {city} "
-            f"with a temperature of {temperature}°C "
-            f"and an AQI of {aqi}. "
-            "Include both a packing list and travel tips."
-        )
-        
-        # Retrieve the most relevant document
-        relevant_document = search_query(query)
-        
-        # Use Ollama to refine the response
-        context = relevant_document + "\n\n" + "Question: " + query
-        response = ollama.chat(
-            model='mistral:latest',
-            messages=[{"role": "user", "content": context}]
-        )
-        
-        # Parse the response into a structured format
-        # (You might need to adjust this based on how the model responds)
+        with timed("llm_warmup"):
+            ollama_client.chat(
+                model=OLLAMA_MODEL,
+                messages=[{"role": "system", "content": SYSTEM_PROMPT}],
+                options={"num_predict": 1},
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+    except Exception as e:
+        logger.warning("LLM warm-up failed: %s", e)
+
+def _facet_lookup(city: str, temperature: float, aqi: int):
+    """Map the trip onto corpus facets (see services/packing_facets.py).
+
+    Returns (document, candidates): the document when exactly one entry
+    matches city, weather and air quality, otherwise the candidate ids to
+    rerank (empty: search everything).
+    """
+    state = packing_index
+    candidates, exact = state.facets.candidates(city, temperature, aqi)
+    if exact and len(candidates) == 1:
+        PACKING_RETRIEVAL.labels("facet_exact").inc()
+        return state.texts(candidates)[0], None
+    PACKING_RETRIEVAL.labels("facet_rerank" if candidates else "vector").inc()
+    return None, candidates or None
+
+def _retrieve_context(city: str, temperature: float, aqi: int):
+    """Retrieve the most relevant document and build the Ollama prompt"""
+    # Initialize the service if not already done
+    initialize_packing_service()
+
+    query = build_query(city, temperature, aqi)
+    relevant_document, candidates = _facet_lookup(city, temperature, aqi)
+    if relevant_document is None:
+        relevant_document = search_query(query, candidates)
+    return relevant_document, _build_messages(relevant_document, query)
+
+def retrieval_only_packing(document: str) -> Dict[str, Any]:
+    """Degraded answer built from the retrieved document(s) when the LLM can't be used."""
+    packing_list = []
+    for part in document.split("\n\n"):
+        _, _, items = part.partition("pack:")
+        # split on commas that aren't inside a "(for ...)" note
+        for item in re.split(r',\s*(?![^()]*\))', items.strip().rstrip('.')):
+            if item.strip() and item.strip() not in packing_list:
+                packing_list.append(item.strip())
+    return {
+        "packing_list": packing_list,
+        "travel_tips": [],
+        "source": "Travel knowledge base (AI suggestions unavailable)"
+    }
+
+def get_packing_suggestions(city: str, temperature: float, aqi: int,
+                            deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Get packing suggestions based on location, weather, and air quality.
+
+    `deadline` is a time.monotonic() value; if the LLM can't answer in time
+    (or is overloaded/failing) a retrieval-only answer is returned instead.
+    """
+    try:
+        cached = packing_cache.get(city, temperature, aqi)
+        if cached is not None:
+            return cached
+        document, messages = _retrieve_context(city, temperature, aqi)
+    except Exception as e:
         return {
-            "packing_list": extract_list_items(response['message']['content']),
-            "travel_tips": extract_tips(response['message']['content']),
-            "source": "AI-generated based on travel knowledge base"
+            "error": str(e),
+            "packing_list": [],
+            "travel_tips": []
         }
-        
+
+    return _generate(city, temperature, aqi, document, messages, deadline)
+
+def _generate(city: str, temperature: float, aqi: int, document: str,
+              messages: list, deadline: Optional[float]) -> Dict[str, Any]:
+    try:
+        # Use Ollama to refine the retrieved document
+        with llm_scheduler.slot(deadline), timed("llm_generate"):
+            response = _chat(messages)
+    except LLMOverloaded as e:
+        logger.warning("Degrading packing for %s: %s", city, e)
+        PACKING_DEGRADED.labels("overloaded").inc()
+        return retrieval_only_packing(document)
+    except Exception as e:
+        logger.warning("LLM generation failed for %s: %s", city, e)
+        record_upstream_error("ollama", type(e).__name__)
+        PACKING_DEGRADED.labels("llm_error").inc()
+        return retrieval_only_packing(document)
+
+    # Parse the response into a structured format
+    with timed("response_parse"):
+        parsed = parse_packing_response(response['message']['content'])
+    if not parsed["packing_list"]:
+        logger.warning("LLM returned no packing items for %s", city)
+        PACKING_DEGRADED.labels("empty_answer").inc()
+        return retrieval_only_packing(document)
+    result = {
+        **parsed,
+        "source": AI_SOURCE
+    }
+    packing_cache.set(city, temperature, aqi, result)
+    return result
+
+def _retrieve_documents(trips: list) -> list:
+    """Best document for each (city, temperature, aqi): facet lookups first, the rest in one search batch."""
+    lookups = [_facet_lookup(*trip) for trip in trips]
+    pending = [n for n, (document, _) in enumerate(lookups) if document is None]
+    searched = search_queries(
+        [build_query(*trips[n]) for n in pending], [lookups[n][1] for n in pending]
+    ) if pending else []
+    documents = [document for document, _ in lookups]
+    for n, document in zip(pending, searched):
+        documents[n] = document
+    return documents
+
+def build_trip_query(city: str, days: list, aqi: int) -> str:
+    """Create a query for a multi-day trip from its daily forecast"""
+    rainy = sum(1 for day in days if day["precipitation_chance"] >= 0.5)
+    return (
+        f"Provide packing suggestions for a {len(days)}-day trip to {city} "
+        f"with temperatures between {min(d['temp_min'] for d in days)}°C "
+        f"and {max(d['temp_max'] for d in days)}°C, "
+        f"{rainy} day(s) likely to see rain "
+        f"and a worst AQI of {aqi}. "
+        "Include both a packing list and travel tips."
+    )
+
+def trip_cache_city(city: str, temp_min: float, temp_max: float) -> str:
+    """Packing cache "city" for a trip: the city plus the range of temperature bands.
+
+    The range is part of the key, so trips don't collide with single-day
+    results. Bands are spelled with a sign letter ("n1", "p2") because the
+    cache key is normalized and would drop a minus sign.
+    """
+    def signed(band: int) -> str:
+        return f"n{-band}" if band < 0 else f"p{band}"
+
+    band = packing_cache.temperature_band
+    return f"{city} trip {signed(band(temp_min))} {signed(band(temp_max))}"
+
+def get_trip_packing_suggestions(city: str, days: list,
+                                 deadline: Optional[float] = None) -> Dict[str, Any]:
+    """One packing answer for a whole trip, from its daily forecast (see services/forecast.py).
+
+    One document is retrieved per weather band the trip spans (in a single
+    batch) and the LLM is called once with all of them. Results are cached
+    on the trip's temperature range and worst AQI.
+    """
+    temp_min = min(day["temp_min"] for day in days)
+    temp_max = max(day["temp_max"] for day in days)
+    temp_mean = sum(day["temp_mean"] for day in days) / len(days)
+    aqi = max((day["aqi"] for day in days if day["aqi"] is not None), default=1)
+    cache_city = trip_cache_city(city, temp_min, temp_max)
+    try:
+        cached = packing_cache.get(cache_city, temp_mean, aqi)
+        if cached is not None:
+            return cached
+        initialize_packing_service()
+        # one representative temperature per weather band
+        probes = {weather_band(t): t for t in (temp_min, temp_mean, temp_max)}
+        documents = _retrieve_documents([(city, t, aqi) for t in probes.values()])
     except Exception as e:
         return {
             "error": str(e),
@@ -240,17 +380,167 @@ def get_packing_suggestions(city: str, temperature: float, aqi: int) -> Dict[str
             "travel_tips": []
         }
 
+    document = "\n\n".join(dict.fromkeys(documents))
+    query = build_trip_query(city, days, aqi)
+    return _generate(cache_city, temp_mean, aqi, document, _build_messages(document, query), deadline)
+
+def get_packing_suggestions_batch(trips: list, deadline: Optional[float] = None) -> list:
+    """get_packing_suggestions for many (city, temperature, aqi) trips at once.
+
+    Cache misses are resolved by facet lookup where possible, the rest
+    through a single encode/search batch, then generated concurrently (still bounded by the LLM scheduler). Results are
+    returned in input order; a failed retrieval yields an "error" entry.
+
+    `deadline` is shared by the whole batch but admitted per item: once the
+    time left is below the scheduler's generation estimate, the remaining
+    items get the retrieval-only answer instead of waiting their turn.
+    """
+    results: list = [None] * len(trips)
+    misses = []
+    for i, (city, temperature, aqi) in enumerate(trips):
+        cached = packing_cache.get(city, temperature, aqi)
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+    if not misses:
+        return results
+
+    queries = [build_query(*trips[i]) for i in misses]
+    try:
+        initialize_packing_service()
+        retrieved = _retrieve_documents([trips[i] for i in misses])
+    except Exception as e:
+        for i in misses:
+            results[i] = {"error": str(e), "packing_list": [], "travel_tips": []}
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, llm_scheduler.max_concurrency)) as pool:
+        futures = {
+            i: pool.submit(_generate, *trips[i], document, _build_messages(document, query), deadline)
+            for i, document, query in zip(misses, retrieved, queries)
+        }
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+def _parse_stream(stream) -> Iterator[Dict[str, str]]:
+    parser = None
+    for chunk in stream:
+        text = chunk['message']['content']
+        if parser is None:
+            if not text.strip():
+                continue
+            # JSON as requested, or prose from a server that ignores `format`
+            parser = PackingJSONStreamParser() if text.lstrip().startswith("{") else PackingStreamParser()
+        yield from parser.feed(text)
+    if parser is not None:
+        yield from parser.finish()
+
+def _packing_events(result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for item in result["packing_list"]:
+        yield {"type": "packing_item", "text": item}
+    for tip in result["travel_tips"]:
+        yield {"type": "travel_tip", "text": tip}
+    yield {"type": "packing_done", "source": result["source"]}
+
+_STREAM_END = object()
+
+def _stream_generation(city: str, temperature: float, aqi: int, messages: list,
+                       deadline: Optional[float], out: "queue.Queue") -> None:
+    """Run one streamed generation, putting each parsed event on `out`.
+
+    Runs on its own thread so the LLM slot and the llm_generate timing cover
+    the generation only: a slow or disconnected client never holds a slot.
+    Ends with _STREAM_END, or the exception that stopped it. A complete
+    answer is cached even if nobody is reading any more.
+    """
+    result = {"packing_list": [], "travel_tips": []}
+    try:
+        with llm_scheduler.slot(deadline), timed("llm_generate"):
+            for event in _parse_stream(_chat(messages, stream=True)):
+                key = "packing_list" if event["type"] == "packing_item" else "travel_tips"
+                result[key].append(event["text"])
+                out.put(event)
+    except Exception as e:
+        out.put(e)
+        return
+    if result["packing_list"]:
+        result["source"] = AI_SOURCE
+        packing_cache.set(city, temperature, aqi, result)
+    out.put(_STREAM_END)
+
+def stream_packing_suggestions(city: str, temperature: float, aqi: int,
+                               deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Like get_packing_suggestions, but yields items and tips as Ollama generates them.
+
+    Yields {"type": "packing_item" | "travel_tip", "text": ...} events, then a
+    final {"type": "packing_done", "source": ...}, or {"type": "packing_error",
+    "error": ...} if generation fails.
+    """
+    try:
+        cached = packing_cache.get(city, temperature, aqi)
+        if cached is not None:
+            yield from _packing_events(cached)
+            return
+        document, messages = _retrieve_context(city, temperature, aqi)
+    except Exception as e:
+        yield {"type": "packing_error", "error": str(e)}
+        return
+
+    result = {"packing_list": [], "travel_tips": []}
+    events: "queue.Queue" = queue.Queue()
+    threading.Thread(
+        target=_stream_generation, args=(city, temperature, aqi, messages, deadline, events),
+        daemon=True
+    ).start()
+    try:
+        while True:
+            event = events.get()
+            if event is _STREAM_END:
+                break
+            if isinstance(event, Exception):
+                raise event
+            key = "packing_list" if event["type"] == "packing_item" else "travel_tips"
+            result[key].append(event["text"])
+            yield event
+    except Exception as e:
+        logger.warning("Degrading packing for %s: %s", city, e)
+        if isinstance(e, LLMOverloaded):
+            PACKING_DEGRADED.labels("overloaded").inc()
+        else:
+            record_upstream_error("ollama", type(e).__name__)
+            PACKING_DEGRADED.labels("llm_error").inc()
+        if result["packing_list"] or result["travel_tips"]:
+            # part of the answer is already out; don't mix in the degraded one
+            yield {"type": "packing_error", "error": str(e)}
+        else:
+            yield from _packing_events(retrieval_only_packing(document))
+        return
+
+    if not result["packing_list"]:
+        logger.warning("LLM returned no packing items for %s", city)
+        PACKING_DEGRADED.labels("empty_answer").inc()
+        if not result["travel_tips"]:
+            yield from _packing_events(retrieval_only_packing(document))
+            return
+        # tips are already out; finish without caching the incomplete answer
+        yield {"type": "packing_done", "source": AI_SOURCE}
+        return
+
+    yield {"type": "packing_done", "source": AI_SOURCE}
+
 def extract_list_items(text: str) -> list:
-    """Extract numbered packing list items from the LLM response."""
-    # Look for lines starting with a number followed by a period
-    items = re.findall(r'\d+\.\s+(.*?)(?=\d+\.|Travel Tips:|$)', text, re.DOTALL)
-    return [item.strip().replace('\n', ' ') for item in items]
+    """Extract packing list items from the LLM response."""
+    return parse_packing_response(text)["packing_list"]
 
 def extract_tips(text: str) -> list:
-    """Extract numbered travel tips from the LLM response."""
-    match = re.search(r'Travel Tips:\s*(.+)', text, re.DOTALL)
-    if match:
-        tips_block = match.group(1)
-        tips = re.findall(r'\d+\.\s+(.*?)(?=\d+\.|$)', tips_block, re.DOTALL)
-        return [tip.strip().replace('\n', ' ') for tip in tips]
-    return []
+    """Extract travel tips from the LLM response."""
+    return parse_packing_response(text)["travel_tips"]
+
+
+if __name__ == "__main__":
+    # Build step: `python -m services.packing` from the backend directory
+    initialize_packing_service()
+    print(f"Packing index {packing_index.version} ({packing_index.meta['count']} entries) in {INDEX_DIR}")
+    print(f"recall@10 vs exact search: {measure_recall(packing_index):.3f}")
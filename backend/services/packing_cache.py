@@ -0,0 +1,207 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from services.cache import normalize_city
+from services.metrics import record_cache
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PACKING_CACHE_DB_PATH = os.getenv("PACKING_CACHE_DB_PATH", str(DATA_DIR / "packing_cache.sqlite3"))
+PACKING_CACHE_TTL_SECONDS = float(os.getenv("PACKING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PACKING_CACHE_MAX_ENTRIES = int(os.getenv("PACKING_CACHE_MAX_ENTRIES", "10000"))
+PACKING_TEMP_BAND_C = float(os.getenv("PACKING_TEMP_BAND_C", "5"))
+# Results also kept in process memory, so repeat hits never touch SQLite
+PACKING_CACHE_MEMORY_ENTRIES = int(os.getenv("PACKING_CACHE_MEMORY_ENTRIES", "1024"))
+# How often recorded accesses are written back and expired/excess rows pruned
+PACKING_CACHE_MAINTENANCE_SECONDS = float(os.getenv("PACKING_CACHE_MAINTENANCE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class PackingResultCache:
+    """Persistent cache of parsed packing results.
+
+    Keyed on (normalized city, temperature band, AQI level) so nearby
+    temperatures share one LLM generation. Entries expire after `ttl` seconds
+    and the least recently used ones are dropped beyond `max_entries`.
+
+    Hits are served from an in-memory LRU in front of SQLite when possible.
+    Access times are batched and written back, and pruning runs, at most
+    every `maintenance_interval` seconds, so the request path doesn't write
+    on every hit. The database runs in WAL mode, so workers reading it don't
+    block each other or a writer. A database error is logged and treated as
+    a miss (or a skipped store); it never fails the request.
+    """
+
+    def __init__(self, db_path: str = PACKING_CACHE_DB_PATH,
+                 ttl: float = PACKING_CACHE_TTL_SECONDS,
+                 max_entries: int = PACKING_CACHE_MAX_ENTRIES,
+                 band_width: float = PACKING_TEMP_BAND_C,
+                 memory_entries: int = PACKING_CACHE_MEMORY_ENTRIES,
+                 maintenance_interval: float = PACKING_CACHE_MAINTENANCE_SECONDS):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.band_width = band_width
+        self.memory_entries = memory_entries
+        self.maintenance_interval = maintenance_interval
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._lock = threading.Lock()
+        # key -> (serialized result, created_at); callers get their own copy on every hit
+        self._memory: "OrderedDict[Tuple[str, int, int], Tuple[str, float]]" = OrderedDict()
+        self._touched: Dict[Tuple[str, int, int], float] = {}
+        self._maintained_at = time.monotonic()
+        # sqlite connections must not be shared with a forked child
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._db = None
+        self._lock = threading.Lock()
+
+    def key(self, city: str, temperature: float, aqi: int) -> Tuple[str, int, int]:
+        return normalize_city(city), self.temperature_band(temperature), int(aqi)
+
+    def temperature_band(self, temperature: float) -> int:
+        return math.floor(temperature / self.band_width)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: commits don't fsync; a crash can only lose recent cache rows
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS packing_results ("
+                "city TEXT NOT NULL, temp_band INTEGER NOT NULL, aqi INTEGER NOT NULL, "
+                "result TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (city, temp_band, aqi))"
+            )
+            db.commit()
+            # only keep a connection once it is fully set up, so a failure here is retried
+            self._db = db
+        return self._db
+
+    def _remember(self, key: Tuple[str, int, int], result: str, created_at: float) -> None:
+        self._memory[key] = (result, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, city: str, temperature: float, aqi: int) -> Optional[Dict[str, Any]]:
+        key = self.key(city, temperature, aqi)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                result = entry[0]
+            else:
+                self._memory.pop(key, None)
+                try:
+                    row = self._connect().execute(
+                        "SELECT result, created_at FROM packing_results "
+                        "WHERE city = ? AND temp_band = ? AND aqi = ?", key
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning("Packing cache lookup failed: %s", e)
+                    row = None
+                if row is None or now - row[1] >= self.ttl:
+                    self.misses += 1
+                    record_cache("packing", "miss")
+                    return None
+                result = row[0]
+                self._remember(key, result, row[1])
+            self._touched[key] = now
+            self.hits += 1
+            record_cache("packing", "hit")
+            self._maintain()
+        return json.loads(result)
+
+    def contains(self, city: str, temperature: float, aqi: int) -> bool:
+        """Whether a live entry exists, without counting a lookup or touching its LRU position."""
+        key = self.key(city, temperature, aqi)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                return True
+            try:
+                row = self._connect().execute(
+                    "SELECT created_at FROM packing_results "
+                    "WHERE city = ? AND temp_band = ? AND aqi = ?", key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Packing cache lookup failed: %s", e)
+                return False
+        return row is not None and now - row[0] < self.ttl
+
+    def set(self, city: str, temperature: float, aqi: int, result: Dict[str, Any]) -> None:
+        key = self.key(city, temperature, aqi)
+        now = time.time()
+        serialized = json.dumps(result)
+        with self._lock:
+            self._remember(key, serialized, now)
+            self._touched.pop(key, None)
+            try:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO packing_results "
+                    "(city, temp_band, aqi, result, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, serialized, now, now)
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Packing cache store failed: %s", e)
+                self._rollback()
+            self._maintain()
+
+    def _maintain(self, force: bool = False) -> None:
+        """Write back batched access times and prune, if due. Caller holds the lock."""
+        if not force and time.monotonic() - self._maintained_at < self.maintenance_interval:
+            return
+        self._maintained_at = time.monotonic()
+        touched, self._touched = self._touched, {}
+        try:
+            db = self._connect()
+            db.executemany(
+                "UPDATE packing_results SET accessed_at = MAX(accessed_at, ?) "
+                "WHERE city = ? AND temp_band = ? AND aqi = ?",
+                [(accessed_at, *key) for key, accessed_at in touched.items()]
+            )
+            db.execute("DELETE FROM packing_results WHERE created_at <= ?", (time.time() - self.ttl,))
+            db.execute(
+                "DELETE FROM packing_results WHERE rowid IN ("
+                "SELECT rowid FROM packing_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning("Packing cache maintenance failed: %s", e)
+            self._rollback()
+
+    def _rollback(self) -> None:
+        try:
+            if self._db is not None:
+                self._db.rollback()
+        except sqlite3.Error:
+            self._db = None
+
+    def flush(self) -> None:
+        """Write back pending access times and prune now (e.g. at shutdown)."""
+        with self._lock:
+            self._maintain(force=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM packing_results").fetchone()[0]
+        return {"size": size, "hits": self.hits, "misses": self.misses, "memory": len(self._memory)}
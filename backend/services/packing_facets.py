@@ -0,0 +1,98 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from services.cache import normalize_city
+from services.city_store import get_city_store
+
+# "For a city trip to Tokyo with hot weather and good air quality, pack: ..."
+FACETS_RE = re.compile(
+    r"^For an? (?P<trip>.+?)(?: (?:to|in) (?P<city>[^,]+?))? with "
+    r"(?P<weather>hot|mild|cold) weather and (?P<air>good|moderate|unhealthy) air quality",
+    re.IGNORECASE
+)
+
+# Temperature (°C) band edges: below COLD_BELOW is cold, HOT_FROM and above is hot
+COLD_BELOW_C = float(os.getenv("PACKING_COLD_BELOW_C", "10"))
+HOT_FROM_C = float(os.getenv("PACKING_HOT_FROM_C", "25"))
+
+
+def weather_band(temperature: float) -> str:
+    if temperature < COLD_BELOW_C:
+        return "cold"
+    if temperature >= HOT_FROM_C:
+        return "hot"
+    return "mild"
+
+
+def air_band(aqi: int) -> str:
+    """OpenWeather AQI 1-5: 1-2 good, 3 moderate, 4-5 unhealthy."""
+    if aqi <= 2:
+        return "good"
+    if aqi == 3:
+        return "moderate"
+    return "unhealthy"
+
+
+def extract_facets(entry: Dict) -> Dict[str, Optional[str]]:
+    """Facets of a corpus entry; explicit `facets` in the JSONL entry take precedence."""
+    facets = {"trip": None, "city": None, "weather": None, "air": None}
+    match = FACETS_RE.match(entry["text"])
+    if match:
+        facets.update(
+            trip=re.sub(r"\s+trip$", "", match.group("trip"), flags=re.IGNORECASE).lower(),
+            city=normalize_city(match.group("city")) if match.group("city") else None,
+            weather=match.group("weather").lower(),
+            air=match.group("air").lower()
+        )
+    facets.update(entry.get("facets") or {})
+    if facets["city"]:
+        facets["city"] = normalize_city(facets["city"])
+    return facets
+
+
+class FacetIndex:
+    """Inverted index from (facet, value) to corpus faiss ids.
+
+    `candidates()` narrows a request to the entries that fit it: the
+    city's entries for the same weather and air-quality bands when there
+    are any (an exact match), else the generic entries for those bands
+    together with the city's entries that share at least one of them. An
+    empty result means there is nothing better than a full vector search.
+    """
+
+    def __init__(self, entries: Iterable[Dict]):
+        self._postings: Dict[tuple, Set[int]] = defaultdict(set)
+        self._generic: Set[int] = set()
+        # corpus and request cities meet on the city store's canonical names ("rio" -> "rio de janeiro")
+        self._cities = get_city_store()
+        for entry in entries:
+            facets = dict(entry.get("facet_values") or extract_facets(entry))
+            if facets["city"]:
+                facets["city"] = self._cities.canonical_key(facets["city"])
+            for name, value in facets.items():
+                if value:
+                    self._postings[(name, value)].add(entry["faiss_id"])
+            if not facets["city"]:
+                self._generic.add(entry["faiss_id"])
+
+    def _ids(self, name: str, value: str) -> Set[int]:
+        return self._postings.get((name, value), set())
+
+    def candidates(self, city: str, temperature: float, aqi: int) -> Tuple[List[int], bool]:
+        """(faiss ids, exact): `exact` means every facet of the request matched.
+
+        A single exact candidate can be served without a vector search; any
+        other result only narrows the rerank. A city entry for other weather
+        (a winter coat list for a heatwave) is never exact.
+        """
+        weather, air = self._ids("weather", weather_band(temperature)), self._ids("air", air_band(aqi))
+        city_ids = self._ids("city", self._cities.canonical_key(city))
+        exact = city_ids & weather & air
+        if exact:
+            return sorted(exact), True
+        generic = self._generic & weather & air
+        if not city_ids:
+            return sorted(generic), bool(generic)
+        return sorted(generic | (city_ids & weather) | (city_ids & air)), False
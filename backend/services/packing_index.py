@@ -0,0 +1,324 @@
+"""Packing knowledge base: external JSONL corpus and its incrementally maintained index.
+
+The corpus lives in `*.jsonl` files (one `{"id": ..., "text": ...}` object
+per line) under PACKING_CORPUS_DIR. Each build is written to its own
+version directory under the index dir, and `current.json` points at the
+live one:
+
+    <index_dir>/current.json
+    <index_dir>/<version>/entries.json     id, text hash, faiss id, facets, text per row
+    <index_dir>/<version>/embeddings.npy   one row per entry (memory-mapped on load)
+    <index_dir>/<version>/index.faiss      FAISS index over the same rows, keyed by faiss id
+    <index_dir>/<version>/meta.json
+
+On update only new or changed entries are embedded. Removed ones are dropped
+from a copy of the live index, so queries running against the old snapshot
+are never disturbed. Small corpora use an exact flat index. Past
+PACKING_ANN_THRESHOLD entries an IVF index is used (or HNSW when
+PACKING_INDEX_TYPE=hnsw), tuned with PACKING_IVF_NPROBE / PACKING_HNSW_EF_SEARCH.
+
+Each entry's facets (trip type, city, weather and air-quality band) are
+extracted at build time and kept in an inverted index alongside the
+vectors (see services/packing_facets.py).
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import faiss
+import numpy as np
+
+from services.packing_facets import FacetIndex, extract_facets
+from services.shared_index import MmapFlatIndex
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CORPUS_DIR = Path(os.getenv("PACKING_CORPUS_DIR", str(DATA_DIR / "packing_corpus")))
+INDEX_TYPE = os.getenv("PACKING_INDEX_TYPE", "auto")
+ANN_THRESHOLD = int(os.getenv("PACKING_ANN_THRESHOLD", "50000"))
+IVF_NPROBE = int(os.getenv("PACKING_IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("PACKING_HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("PACKING_HNSW_EF_SEARCH", "64"))
+# Retrain an IVF index once the corpus outgrows its training set by this factor
+IVF_RETRAIN_GROWTH = 4.0
+KEEP_VERSIONS = 2
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def corpus_files(corpus_dir: Path = CORPUS_DIR) -> List[Path]:
+    return sorted(corpus_dir.glob("*.jsonl"))
+
+
+def corpus_signature(corpus_dir: Path = CORPUS_DIR) -> tuple:
+    """Cheap change detector: file names, sizes and mtimes."""
+    return tuple(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in corpus_files(corpus_dir)
+    )
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> List[Dict[str, str]]:
+    """Read every corpus entry, in file then line order. Later duplicates of an id win."""
+    entries: Dict[str, Dict[str, str]] = {}
+    for path in corpus_files(corpus_dir):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    entries[str(entry["id"])] = {**entry, "id": str(entry["id"]), "text": entry["text"]}
+                except (ValueError, KeyError) as e:
+                    raise ValueError(f"{path}:{line_no}: invalid corpus entry ({e})")
+    return list(entries.values())
+
+
+def corpus_hash(corpus: List[Dict[str, str]], embedder: str) -> str:
+    digest = hashlib.sha256(embedder.encode("utf-8"))
+    for entry in corpus:
+        digest.update(b"\0" + entry["id"].encode("utf-8") + b"\0" + _text_hash(entry["text"]).encode())
+        if entry.get("facets"):
+            digest.update(json.dumps(entry["facets"], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def choose_index_type(count: int) -> str:
+    if INDEX_TYPE != "auto":
+        return INDEX_TYPE
+    return "flat" if count < ANN_THRESHOLD else "ivf"
+
+
+def build_faiss_index(embeddings: np.ndarray, ids: np.ndarray, index_type: str):
+    """Build a FAISS index over `embeddings`, keyed by `ids`."""
+    dim = embeddings.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    elif index_type == "ivf":
+        nlist = max(1, min(int(4 * np.sqrt(len(embeddings))), len(embeddings) // 39 or 1))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(embeddings)
+    elif index_type == "hnsw":
+        index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, HNSW_M))
+    else:
+        raise ValueError(f"Unknown PACKING_INDEX_TYPE '{index_type}'")
+    if len(embeddings):
+        index.add_with_ids(embeddings, ids)
+    apply_search_params(index, index_type)
+    return index
+
+
+def apply_search_params(index, index_type: str) -> None:
+    if index_type == "ivf":
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    elif index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = HNSW_EF_SEARCH
+
+
+class PackingIndex:
+    """Immutable snapshot of the corpus index. Swapped wholesale on reload."""
+
+    def __init__(self, entries: List[Dict], embeddings: np.ndarray, index, meta: Dict,
+                 shared: bool = False):
+        self.entries = entries
+        self.embeddings = embeddings
+        self.index = index
+        self.meta = meta
+        self.ids = np.array([e["faiss_id"] for e in entries], dtype=np.int64)
+        self.by_faiss_id = {e["faiss_id"]: e for e in entries}
+        self.row_of = {e["faiss_id"]: row for row, e in enumerate(entries)}
+        self.facets = FacetIndex(entries)
+        # exact search over the shared memory-mapped file (see services/shared_index.py)
+        self._shared_flat = MmapFlatIndex(embeddings) if shared and meta["index_type"] == "flat" else None
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+    def search(self, vectors: np.ndarray, k: int = 1):
+        """Returns (distances, faiss ids); ids are -1 where fewer than k hits exist."""
+        if self._shared_flat is not None:
+            D, rows = self._shared_flat.search(vectors, k)
+            return D, self.ids[rows]
+        return self.index.search(vectors, k)
+
+    def rerank(self, vector: np.ndarray, candidates: List[int]) -> int:
+        """Exact nearest of `candidates` (faiss ids) to a single query vector."""
+        rows = [self.row_of[c] for c in candidates]
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        distances = np.einsum("ij,ij->i", vectors - vector, vectors - vector)
+        return candidates[int(np.argmin(distances))]
+
+    def texts(self, ids) -> List[str]:
+        return [self.by_faiss_id[int(i)]["text"] for i in ids]
+
+
+def _version_dirs(index_dir: Path) -> List[Path]:
+    return sorted(p for p in index_dir.iterdir() if p.is_dir() and p.name.startswith("v"))
+
+
+def load_index(index_dir: Path, shared: bool = False) -> Optional[PackingIndex]:
+    """Load the live version, or None if there isn't a complete one."""
+    try:
+        with open(index_dir / "current.json") as f:
+            version_dir = index_dir / json.load(f)["version"]
+        with open(version_dir / "meta.json") as f:
+            meta = json.load(f)
+        with open(version_dir / "entries.json", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+    embeddings = np.load(version_dir / "embeddings.npy", mmap_mode="r")
+    index = None
+    if not (shared and meta["index_type"] == "flat"):
+        index = faiss.read_index(str(version_dir / "index.faiss"), faiss.IO_FLAG_MMAP)
+        apply_search_params(index, meta["index_type"])
+    return PackingIndex(entries, embeddings, index, meta, shared)
+
+
+def _save_index(index_dir: Path, entries: List[Dict], embeddings: np.ndarray, index, meta: Dict) -> None:
+    version_dir = index_dir / meta["version"]
+    version_dir.mkdir(parents=True)
+    np.save(version_dir / "embeddings.npy", embeddings)
+    faiss.write_index(index, str(version_dir / "index.faiss"))
+    with open(version_dir / "entries.json", "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    with open(version_dir / "meta.json", "w") as f:
+        json.dump(meta, f)
+    # flip the pointer last so readers only ever see complete versions
+    tmp = index_dir / "current.json.tmp"
+    tmp.write_text(json.dumps({"version": meta["version"]}))
+    os.replace(tmp, index_dir / "current.json")
+    # older versions may still be mapped by other workers; unlinking is safe on POSIX
+    for old in _version_dirs(index_dir)[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+@contextmanager
+def _build_lock(index_dir: Path) -> Iterator[None]:
+    """Serialise builds across worker processes."""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    with open(index_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def sync_index(index_dir: Path, corpus: List[Dict[str, str]], embedder: str,
+               encode: Callable[[List[str]], np.ndarray], shared: bool = False) -> PackingIndex:
+    """Return an index matching `corpus`, updating the on-disk one incrementally if needed."""
+    if not corpus:
+        raise ValueError(f"Packing corpus is empty (no entries in {CORPUS_DIR}/*.jsonl)")
+    target_hash = corpus_hash(corpus, embedder)
+    with _build_lock(index_dir):
+        current = load_index(index_dir, shared)
+        if current is not None and current.meta["corpus_hash"] == target_hash:
+            return current
+
+        previous = current if current is not None and current.meta["embedder"] == embedder else None
+        entries, embeddings, index, meta = _update(previous, corpus, encode)
+        meta.update(corpus_hash=target_hash, embedder=embedder)
+        _save_index(index_dir, entries, embeddings, index, meta)
+        state = load_index(index_dir, shared)
+    if meta["index_type"] != "flat":
+        # brute-force check, so only once per new version rather than on every load
+        logger.info("Packing index %s recall@10 vs exact: %.3f", meta["index_type"], measure_recall(state))
+    return state
+
+
+def _update(previous: Optional[PackingIndex], corpus: List[Dict[str, str]],
+            encode: Callable[[List[str]], np.ndarray]):
+    old = {e["id"]: (row, e) for row, e in enumerate(previous.entries)} if previous else {}
+    next_id = previous.meta["next_id"] if previous else 0
+
+    kept_rows, entries, to_encode = [], [], []
+    for entry in corpus:
+        text_hash = _text_hash(entry["text"])
+        prior = old.get(entry["id"])
+        if prior is not None and prior[1]["hash"] == text_hash:
+            kept_rows.append(prior[0])
+            # metadata (e.g. explicit facets) can change without the text and its embedding
+            entries.append({
+                **entry, "hash": text_hash, "faiss_id": prior[1]["faiss_id"],
+                "facet_values": extract_facets(entry)
+            })
+        else:
+            to_encode.append({
+                **entry, "hash": text_hash, "faiss_id": next_id,
+                "facet_values": extract_facets(entry)
+            })
+            next_id += 1
+    kept_ids = {e["faiss_id"] for e in entries}
+    removed = [e["faiss_id"] for e in (previous.entries if previous else []) if e["faiss_id"] not in kept_ids]
+
+    logger.info(
+        "Packing index update: %d unchanged, %d to embed, %d removed",
+        len(entries), len(to_encode), len(removed)
+    )
+    new_vectors = (
+        np.ascontiguousarray(encode([e["text"] for e in to_encode]), dtype=np.float32)
+        if to_encode else None
+    )
+    parts = []
+    if previous is not None and kept_rows:
+        parts.append(np.asarray(previous.embeddings[kept_rows], dtype=np.float32))
+    if new_vectors is not None:
+        parts.append(new_vectors)
+    embeddings = np.ascontiguousarray(np.concatenate(parts), dtype=np.float32)
+    entries = entries + to_encode
+    ids = np.array([e["faiss_id"] for e in entries], dtype=np.int64)
+
+    index_type = choose_index_type(len(entries))
+    trained_on = previous.meta.get("trained_on", 0) if previous else 0
+    rebuild = (
+        previous is None
+        or previous.index is None
+        or previous.meta["index_type"] != index_type
+        or (index_type == "hnsw" and removed)
+        or (index_type == "ivf" and len(entries) > IVF_RETRAIN_GROWTH * trained_on)
+    )
+    if rebuild:
+        index = build_faiss_index(embeddings, ids, index_type)
+        trained_on = len(entries)
+    else:
+        # copy, so the live snapshot keeps serving untouched
+        index = faiss.clone_index(previous.index)
+        if removed:
+            index.remove_ids(np.array(removed, dtype=np.int64))
+        if new_vectors is not None:
+            index.add_with_ids(new_vectors, ids[-len(to_encode):])
+        apply_search_params(index, index_type)
+
+    meta = {
+        "version": f"v{time.time_ns()}",
+        "index_type": index_type,
+        "count": len(entries),
+        "dim": int(embeddings.shape[1]),
+        "next_id": next_id,
+        "trained_on": trained_on,
+    }
+    return entries, embeddings, index, meta
+
+
+def measure_recall(state: PackingIndex, k: int = 10, sample: int = 1000, seed: int = 0) -> float:
+    """Recall@k of the live index against exact flat search, using corpus vectors as queries."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(state.entries), size=min(sample, len(state.entries)), replace=False)
+    queries = np.ascontiguousarray(state.embeddings[rows], dtype=np.float32)
+    k = min(k, len(state.entries))
+    _, exact = MmapFlatIndex(np.asarray(state.embeddings)).search(queries, k)
+    _, approx = state.search(queries, k)
+    exact_ids = state.ids[exact]
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact_ids.tolist(), approx.tolist()))
+    return hits / (len(rows) * k)
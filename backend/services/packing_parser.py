@@ -0,0 +1,154 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+# "1. item", "2) item", "- item", "* item"
+ITEM_RE = re.compile(r'^\s*(?:\d+[.)]|[-*•])\s+(.*)')
+# the start of another numbered item later on the same line: "1. Stay dry 2. Eat well"
+INLINE_ITEM_RE = re.compile(r'(?<=\S)\s+(?=\d+\.\s)')
+# "Travel Tips:", "**Travel Tips:**", "## Packing List" ... optionally followed by content
+HEADING_RE = re.compile(r'^\s*[#*\s]*(packing list|travel tips)\b[\s*:]*(.*)$', re.IGNORECASE)
+
+
+class PackingStreamParser:
+    """Incrementally parses LLM output into packing items and travel tips.
+
+    Feed it text chunks as they stream in; it returns events for every item
+    that is complete so far. An item is complete once the next item, a
+    heading or a blank line starts. Numbered items before a "Travel Tips"
+    heading are packing items, after it they are tips.
+    """
+
+    def __init__(self):
+        self.section = "packing_item"
+        self._buffer = ""
+        self._current: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        self._buffer += chunk
+        events = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            events.extend(self._line(line))
+        return events
+
+    def finish(self) -> List[Dict[str, str]]:
+        events = self._line(self._buffer) if self._buffer else []
+        self._buffer = ""
+        events.extend(self._flush())
+        return events
+
+    def _line(self, line: str) -> List[Dict[str, str]]:
+        heading = HEADING_RE.match(line)
+        if heading:
+            events = self._flush()
+            self.section = "travel_tip" if heading.group(1).lower() == "travel tips" else "packing_item"
+            rest = heading.group(2).strip()
+            return events + (self._line(rest) if rest else [])
+
+        segments = INLINE_ITEM_RE.split(line)
+        if len(segments) > 1:
+            return [event for segment in segments for event in self._line(segment)]
+
+        item = ITEM_RE.match(line)
+        if item:
+            events = self._flush()
+            self._current = item.group(1).strip()
+            return events
+        if not line.strip():
+            return self._flush()
+        if self._current is not None:
+            self._current += " " + line.strip()
+        return []
+
+    def _flush(self) -> List[Dict[str, str]]:
+        if self._current is None:
+            return []
+        text, self._current = self._current.strip(), None
+        return [{"type": self.section, "text": text}] if text else []
+
+
+class PackingJSONStreamParser:
+    """Incrementally parses schema-constrained JSON output (see PACKING_SCHEMA in services/packing.py).
+
+    Same interface as PackingStreamParser. Each string in the "packing_list"
+    and "travel_tips" arrays is emitted as soon as its closing quote
+    arrives, so output cut off by the length limit still yields every
+    completed item.
+    """
+
+    SECTIONS = {"packing_list": "packing_item", "travel_tips": "travel_tip"}
+
+    def __init__(self):
+        self._depth = 0
+        self._key: Optional[str] = None
+        self._expect_key = False
+        self._string: Optional[List[str]] = None
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        events = []
+        for c in chunk:
+            if self._string is not None:
+                self._string.append(c)
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    events.extend(self._value("".join(self._string)))
+                    self._string = None
+            elif c == '"':
+                self._string = [c]
+            elif c in "{[":
+                self._depth += 1
+                self._expect_key = self._depth == 1 and c == "{"
+            elif c in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and c in ",:":
+                self._expect_key = c == ","
+        return events
+
+    def finish(self) -> List[Dict[str, str]]:
+        # an unterminated string is an item cut off mid-way; drop it
+        self._string = None
+        return []
+
+    def _value(self, literal: str) -> List[Dict[str, str]]:
+        try:
+            text = json.loads(literal)
+        except ValueError:
+            return []
+        if self._depth == 1 and self._expect_key:
+            self._key = text
+            return []
+        if self._depth == 2 and self._key in self.SECTIONS and text.strip():
+            return [{"type": self.SECTIONS[self._key], "text": text.strip()}]
+        return []
+
+
+def parse_packing_response(text: str) -> Dict[str, List[str]]:
+    """Parse a complete LLM response into packing_list and travel_tips.
+
+    JSON output is read directly; prose (a server that ignores `format`) goes
+    through the heading/list parser.
+    """
+    if text.lstrip().startswith("{"):
+        try:
+            data = json.loads(text)
+            result = {}
+            for key in PackingJSONStreamParser.SECTIONS:
+                # a lone string instead of an array is one item, not one per character
+                values = [data[key]] if isinstance(data[key], str) else data[key]
+                result[key] = [item.strip() for item in values if isinstance(item, str) and item.strip()]
+            return result
+        except (ValueError, KeyError, TypeError):
+            # cut off by the length limit: keep the items completed so far
+            parser = PackingJSONStreamParser()
+    else:
+        parser = PackingStreamParser()
+    events = parser.feed(text) + parser.finish()
+    return {
+        "packing_list": [e["text"] for e in events if e["type"] == "packing_item"],
+        "travel_tips": [e["text"] for e in events if e["type"] == "travel_tip"],
+    }
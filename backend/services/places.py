@@ -1,9 +1,14 @@
+from typing import Optional
+
+from services.city_store import CityStore, get_city_store
 
 
 class PlacesService:
-    PLACES_DATA = {
-    "tokyo": ["Shibuya Crossing", "Tokyo Tower"],
-    "paris": ["Eiffel Tower", "Louvre Museum"]
-    }   
+    def __init__(self, store: Optional[CityStore] = None):
+        self.store = store or get_city_store()
+
     def get_places(self, city: str):
-        return PLACES_DATA.get(city.lower(), ["No places data available"])
\ No newline at end of file
+        match = self.store.lookup(city)
+        if match is None or not match.get("places"):
+            return ["No places data available"]
+        return match["places"]
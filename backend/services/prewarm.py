@@ -0,0 +1,211 @@
+"""Background pre-warming of the cities users actually ask for.
+
+Requests are counted per canonical city with exponential decay, so the
+"hot set" follows current demand. Every PREWARM_INTERVAL_SECONDS the
+scheduler does two things for the hot set, most popular first:
+
+- It re-fetches weather and AQI that will expire within PREWARM_LEAD_SECONDS,
+  so requests keep hitting fresh cache entries. Each tick may spend at most
+  PREWARM_UPSTREAM_CALLS_PER_MINUTE worth of calls. All calls still go
+  through the shared OpenWeather rate limiter, and nothing is refreshed
+  while an endpoint's circuit breaker is not closed.
+- It precomputes packing when a hot city's (temperature band, AQI) has no
+  cached result, i.e. whenever its conditions moved to a new band. At most
+  PREWARM_LLM_CONCURRENCY generations run at once, and only while the LLM
+  has no user requests waiting.
+
+Under gunicorn every worker runs a scheduler, but the work is done once:
+workers pool their request counts in a shared SQLite store (see
+services/prewarm_store.py), and only the worker holding its lease runs the
+jobs. The values it fetches are published there and copied into every
+worker's caches on their next tick.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.aqi import AQIService
+from services.cache import normalize_city
+from services.metrics import PREWARM_JOBS
+from services.packing import get_packing_suggestions, llm_scheduler, packing_cache
+from services.prewarm_store import PrewarmStore
+from services.weather import WeatherService
+
+logger = logging.getLogger(__name__)
+
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "30"))
+PREWARM_HOT_CITIES = int(os.getenv("PREWARM_HOT_CITIES", "200"))
+# Cities whose request counts are tracked at all; the lowest-scoring one is dropped beyond this
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "2000"))
+# Decayed request count a city needs to be considered hot
+PREWARM_MIN_REQUESTS = float(os.getenv("PREWARM_MIN_REQUESTS", "3"))
+PREWARM_HALF_LIFE_SECONDS = float(os.getenv("PREWARM_HALF_LIFE_SECONDS", "3600"))
+PREWARM_LEAD_SECONDS = float(os.getenv("PREWARM_LEAD_SECONDS", "120"))
+PREWARM_UPSTREAM_CALLS_PER_MINUTE = float(os.getenv("PREWARM_UPSTREAM_CALLS_PER_MINUTE", "30"))
+PREWARM_LLM_CONCURRENCY = int(os.getenv("PREWARM_LLM_CONCURRENCY", "1"))
+
+
+class RefreshScheduler:
+    def __init__(self, weather_service: WeatherService, aqi_service: AQIService,
+                 interval: float = PREWARM_INTERVAL_SECONDS,
+                 hot_cities: int = PREWARM_HOT_CITIES,
+                 min_requests: float = PREWARM_MIN_REQUESTS,
+                 half_life: float = PREWARM_HALF_LIFE_SECONDS,
+                 lead: float = PREWARM_LEAD_SECONDS,
+                 upstream_calls_per_minute: float = PREWARM_UPSTREAM_CALLS_PER_MINUTE,
+                 llm_concurrency: int = PREWARM_LLM_CONCURRENCY,
+                 max_tracked: int = PREWARM_MAX_TRACKED,
+                 store: Optional[PrewarmStore] = None):
+        self.weather_service = weather_service
+        self.aqi_service = aqi_service
+        self.interval = interval
+        self.hot_cities = hot_cities
+        self.min_requests = min_requests
+        self.half_life = half_life
+        self.lead = lead
+        self.upstream_calls_per_minute = upstream_calls_per_minute
+        self.llm_concurrency = llm_concurrency
+        self.max_tracked = max(max_tracked, hot_cities)
+        self.store = store if store is not None else PrewarmStore()
+        # requests counted since the last tick: key -> (canonical name, count)
+        self.pending: Dict[str, Tuple[str, float]] = {}
+        self.leader = False
+        self.imported_until = 0.0
+
+    def record(self, city: str) -> None:
+        """Count one answered request for `city` (its canonical name).
+
+        Callers record only after weather/AQI came back, so names that don't
+        exist never enter the table; `max_tracked` bounds it regardless.
+        Counts are kept in memory and added to the shared store every tick.
+        """
+        key = normalize_city(city)
+        if key not in self.pending and len(self.pending) >= self.max_tracked:
+            return
+        self.pending[key] = (city, self.pending.get(key, (city, 0.0))[1] + 1)
+
+    @property
+    def lease_ttl(self) -> float:
+        # a lease outlives a couple of missed renewals, not a dead worker
+        return 3 * self.interval
+
+    async def close(self) -> None:
+        """Hand the lease over right away at shutdown instead of letting it expire."""
+        if self.leader:
+            await run_in_threadpool(self.store.release_lease)
+            self.leader = False
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error("Pre-warm tick failed: %s", e)
+
+    async def tick(self) -> None:
+        pending, self.pending = self.pending, {}
+        await run_in_threadpool(self.store.add_demand, pending)
+        await self._import_published()
+        self.leader = await run_in_threadpool(self.store.acquire_lease, self.lease_ttl)
+        if not self.leader:
+            return
+        await run_in_threadpool(
+            self.store.decay, self.half_life, self.min_requests / 10, self.max_tracked
+        )
+        hot = await run_in_threadpool(self.store.hot, self.min_requests, self.hot_cities)
+        if not hot:
+            return
+        await self._refresh_upstream(hot)
+        await self._precompute_packing(hot)
+
+    def _caches(self):
+        return {"weather": self.weather_service.cache, "aqi": self.aqi_service.cache}
+
+    async def _import_published(self) -> None:
+        """Copy values the lease holder fetched into this worker's caches, where newer."""
+        published = await run_in_threadpool(self.store.published_since, self.imported_until)
+        now = time.time()
+        for kind, key, value, fetched_at in published:
+            self.imported_until = max(self.imported_until, fetched_at)
+            cache = self._caches().get(kind)
+            age = max(0.0, now - fetched_at)
+            if cache is None or cache.fresh_for(key) >= cache.ttl - age:
+                continue
+            cache.set(key, value, age=age)
+
+    async def _refresh_upstream(self, hot: List[str]) -> None:
+        budget = int(self.upstream_calls_per_minute * self.interval / 60)
+        jobs = []
+        for city in hot:
+            key = normalize_city(city)
+            for kind, endpoint, service, refresh in (
+                ("weather", "weather", self.weather_service, self.weather_service.refresh_weather),
+                ("aqi", "air_pollution", self.aqi_service, self.aqi_service.refresh_aqi),
+            ):
+                if service.cache is None or service.cache.fresh_for(key) > self.lead:
+                    continue
+                if service.guard.breaker(endpoint).state != "closed":
+                    # leave the probe call to user traffic; keep serving last-known-good
+                    PREWARM_JOBS.labels(kind, "circuit_open").inc()
+                    continue
+                if budget <= 0:
+                    PREWARM_JOBS.labels(kind, "over_budget").inc()
+                    continue
+                budget -= 1
+                jobs.append(self._refresh_and_publish(kind, city, refresh))
+        if jobs:
+            await asyncio.gather(*jobs)
+        # anything older has gone stale and is no use to other workers
+        ttl = max((cache.ttl for cache in self._caches().values() if cache is not None), default=0)
+        await run_in_threadpool(self.store.forget_published, time.time() - ttl)
+
+    async def _refresh_and_publish(self, kind: str, city: str, refresh) -> None:
+        value = await self._run(kind, city, refresh(city))
+        if value is not None:
+            await run_in_threadpool(self.store.publish, kind, normalize_city(city), value)
+
+    async def _precompute_packing(self, hot: List[str]) -> None:
+        pending = []
+        for city in hot:
+            key = normalize_city(city)
+            weather = self.weather_service.cache.peek(key) if self.weather_service.cache else None
+            aqi = self.aqi_service.cache.peek(key) if self.aqi_service.cache else None
+            if weather is None or aqi is None:
+                continue
+            if not await run_in_threadpool(packing_cache.contains, city, weather["temp"], aqi["aqi"]):
+                pending.append((city, weather["temp"], aqi["aqi"]))
+
+        limit = asyncio.Semaphore(max(1, self.llm_concurrency))
+
+        async def generate(city: str, temperature: float, aqi: int) -> None:
+            async with limit:
+                # user requests always come first
+                if llm_scheduler.waiting or llm_scheduler.active >= llm_scheduler.max_concurrency:
+                    PREWARM_JOBS.labels("packing", "llm_busy").inc()
+                    return
+                # generations can outlast the lease; stop if another worker took over
+                if not await run_in_threadpool(self.store.acquire_lease, self.lease_ttl):
+                    self.leader = False
+                    return
+                await self._run("packing", city, run_in_threadpool(
+                    get_packing_suggestions, city=city, temperature=temperature, aqi=aqi
+                ))
+
+        if pending:
+            await asyncio.gather(*(generate(*trip) for trip in pending))
+
+    async def _run(self, kind: str, city: str, job) -> Any:
+        """Await `job`, counting the outcome; its result, or None if it failed."""
+        try:
+            result = await job
+            PREWARM_JOBS.labels(kind, "ok").inc()
+            return result
+        except Exception as e:
+            logger.warning("Pre-warm %s for %s failed: %s", kind, city, e)
+            PREWARM_JOBS.labels(kind, "error").inc()
+            return None
@@ -0,0 +1,150 @@
+"""Pre-warm state shared by every worker process through one SQLite file.
+
+- `demand`: decayed request counts per city. Workers add the counts they
+  saw since their last tick; only the lease holder decays and prunes them.
+- `lease`: which process currently runs the pre-warm jobs. It is renewed
+  every tick and expires if that process dies, so another one takes over.
+- `warm`: weather/AQI values the lease holder fetched. Every worker copies
+  them into its own in-memory caches, so one upstream call warms them all.
+"""
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+PREWARM_DB_PATH = os.getenv("PREWARM_DB_PATH", str(DATA_DIR / "prewarm.sqlite3"))
+
+logger = logging.getLogger(__name__)
+
+
+class PrewarmStore:
+    def __init__(self, db_path: str = PREWARM_DB_PATH):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        # sqlite connections must not be shared with a forked child
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._db = None
+        self._lock = threading.Lock()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS demand ("
+                "city TEXT PRIMARY KEY, name TEXT NOT NULL, score REAL NOT NULL, decayed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS lease ("
+                "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS warm ("
+                "kind TEXT NOT NULL, city TEXT NOT NULL, value TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (kind, city))"
+            )
+            self._db = db
+        return self._db
+
+    def add_demand(self, counts: Dict[str, Tuple[str, float]]) -> None:
+        """Add {city key: (name, requests)} seen by this process since its last call."""
+        if not counts:
+            return
+        now = time.time()
+        with self._lock:
+            self._connect().executemany(
+                "INSERT INTO demand (city, name, score, decayed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(city) DO UPDATE SET score = score + excluded.score, name = excluded.name",
+                [(key, name, count, now) for key, (name, count) in counts.items()]
+            )
+
+    def decay(self, half_life: float, forget_below: float, max_tracked: int) -> None:
+        """Decay every count to now, then drop cold cities and any beyond `max_tracked`."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute("SELECT city, score, decayed_at FROM demand").fetchall()
+                db.executemany(
+                    "UPDATE demand SET score = ?, decayed_at = ? WHERE city = ?",
+                    [(score * math.pow(0.5, (now - decayed_at) / half_life), now, key)
+                     for key, score, decayed_at in rows]
+                )
+                db.execute("DELETE FROM demand WHERE score < ?", (forget_below,))
+                db.execute(
+                    "DELETE FROM demand WHERE city IN ("
+                    "SELECT city FROM demand ORDER BY score DESC LIMIT -1 OFFSET ?)",
+                    (max_tracked,)
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def hot(self, min_score: float, limit: int) -> List[str]:
+        """Names of the cities with at least `min_score`, most requested first."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT name FROM demand WHERE score >= ? ORDER BY score DESC LIMIT ?",
+                (min_score, limit)
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def acquire_lease(self, ttl: float, name: str = "prewarm") -> bool:
+        """Take or renew the lease; True if this process holds it for the next `ttl` seconds."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT owner, expires_at FROM lease WHERE name = ?", (name,)).fetchone()
+                held = row is None or row[0] == self.owner or row[1] <= now
+                if held:
+                    db.execute(
+                        "INSERT OR REPLACE INTO lease (name, owner, expires_at) VALUES (?, ?, ?)",
+                        (name, self.owner, now + ttl)
+                    )
+                db.execute("COMMIT")
+                return held
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def release_lease(self, name: str = "prewarm") -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM lease WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def publish(self, kind: str, city: str, value: Any) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO warm (kind, city, value, fetched_at) VALUES (?, ?, ?, ?)",
+                (kind, city, json.dumps(value), time.time())
+            )
+
+    def published_since(self, since: float) -> List[Tuple[str, str, Any, float]]:
+        """(kind, city key, value, fetched_at) for every value published after `since`."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT kind, city, value, fetched_at FROM warm WHERE fetched_at > ? ORDER BY fetched_at",
+                (since,)
+            ).fetchall()
+        return [(kind, city, json.loads(value), fetched_at) for kind, city, value, fetched_at in rows]
+
+    def forget_published(self, older_than: float) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM warm WHERE fetched_at < ?", (older_than,))
@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class MmapFlatIndex:
+    """Exact L2 search straight over a memory-mapped embeddings matrix.
+
+    faiss.read_index copies the vectors into each process; this reads them
+    from the shared page cache instead, so every worker maps the same
+    physical pages. Exposes the subset of the FAISS index API we use.
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        self.xb = embeddings
+        self.ntotal, self.d = embeddings.shape
+        self._norms = None
+
+    def search(self, queries: np.ndarray, k: int):
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self.xb, self.xb)
+        queries = np.asarray(queries, dtype=np.float32)
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * queries @ self.xb.T
+            + self._norms[None, :]
+        )
+        k = min(k, self.ntotal)
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        order = np.argsort(distances[rows, top], axis=1)
+        I = top[rows, order]
+        return distances[rows, I].astype(np.float32), I.astype(np.int64)
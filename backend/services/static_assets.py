@@ -0,0 +1,135 @@
+"""Static frontend with fingerprinted, precompressed assets.
+
+At startup every file under the frontend directory is read once. Non-HTML
+assets are published under a content-hashed name (`app.css` ->
+`app.3f2a9c1b0d4e.css`) that is cached for a year as immutable, and HTML
+references to `/static/<name>` are rewritten to those names. HTML pages
+(and the plain asset names, kept for compatibility) are served with
+`no-cache`, so browsers revalidate them with their ETag and get a 304.
+
+Compressible files are gzip- and, when the optional `brotli` package is
+installed, brotli-compressed up front; each request just picks a variant.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+from services.http_cache import conditional_response, etag_for
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are produced
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Below this size compression isn't worth a variant
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+STATIC_REF_RE = re.compile(r'(?P<attr>href|src)="/static/(?P<name>[^"?#]+)"')
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class _Asset:
+    def __init__(self, body: bytes, media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = etag_for(body)
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES and media_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+
+    def pick(self, accept_encoding: str) -> str:
+        accepted = _accepted(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.variants and accepted.get(coding, accepted.get("*", 0)) > 0:
+                return coding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        coding = self.pick(request.headers.get("accept-encoding", ""))
+        headers = {"Cache-Control": self.cache_control}
+        if len(self.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        etag = self.etag
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+            # each encoding is its own representation
+            etag = etag[:-1] + "-" + coding + '"'
+        return conditional_response(request, self.variants[coding], self.media_type, headers, etag)
+
+
+class StaticAssets:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.fingerprints: Dict[str, str] = {}
+        self._assets: Dict[str, _Asset] = {}
+        self.load()
+
+    def load(self) -> None:
+        assets, fingerprints, pages = {}, {}, {}
+        for path in sorted(p for p in self.directory.rglob("*") if p.is_file()):
+            name = path.relative_to(self.directory).as_posix()
+            if name.startswith(".") or "/." in name:
+                continue
+            if path.suffix == ".html":
+                pages[name] = path.read_text(encoding="utf-8")
+                continue
+            body = path.read_bytes()
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            stem, dot, suffix = name.rpartition(".")
+            fingerprinted = f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+            fingerprints[name] = fingerprinted
+            assets[fingerprinted] = _Asset(body, media_type, IMMUTABLE)
+            assets[name] = _Asset(body, media_type, REVALIDATE)
+
+        def rewrite(match: "re.Match") -> str:
+            name = fingerprints.get(match.group("name"), match.group("name"))
+            return f'{match.group("attr")}="/static/{name}"'
+
+        for name, html in pages.items():
+            body = STATIC_REF_RE.sub(rewrite, html).encode("utf-8")
+            assets[name] = _Asset(body, "text/html", REVALIDATE)
+
+        self.fingerprints, self._assets = fingerprints, assets
+        logger.info(
+            "Loaded %d static assets from %s (brotli %s)",
+            len(fingerprints), self.directory, "on" if brotli is not None else "off"
+        )
+
+    def get(self, name: str) -> Optional[_Asset]:
+        return self._assets.get(name)
+
+    def response(self, request: Request, name: str) -> Response:
+        asset = self.get(name)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        return asset.response(request)
@@ -0,0 +1,239 @@
+"""Rate limiting and circuit breaking for OpenWeather calls.
+
+Every call made with the API key first takes a token from a bucket kept in
+SQLite, so all worker processes share one budget. Each endpoint also has a
+circuit breaker. After `failure_threshold` consecutive failures (5xx, 429,
+timeouts, connection errors) it opens and calls fail immediately with 503.
+Once `reset_timeout` has passed, a single probe call is let through.
+"""
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from services.metrics import CIRCUIT_OPEN, UPSTREAM_REJECTED
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", str(DATA_DIR / "rate_limit.sqlite3"))
+OPENWEATHER_CALLS_PER_MINUTE = float(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+OPENWEATHER_BURST = float(os.getenv("OPENWEATHER_BURST", "10"))
+# How long a call may wait for a token before failing fast
+RATE_LIMIT_MAX_WAIT_MS = float(os.getenv("RATE_LIMIT_MAX_WAIT_MS", "250"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+
+class UpstreamUnavailable(HTTPException):
+    """A call was refused locally (rate limit or open circuit); nothing was sent upstream."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{endpoint} upstream unavailable ({reason}), retry in {math.ceil(retry_after)}s",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        self.endpoint = endpoint
+        self.reason = reason
+
+
+class TokenBucket:
+    """Token bucket shared by every process using the same SQLite file.
+
+    `reserve()` takes a token now or books one in the future (the balance may
+    go negative) and returns how long the caller has to wait for it. If that
+    wait would exceed `max_wait`, nothing is booked and None is returned.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, db_path: str = RATE_LIMIT_DB_PATH):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+        # sqlite connections must not be shared with a forked child
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self) -> None:
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                self.db_path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            # every upstream call writes here: WAL + NORMAL keeps fsync off that path
+            # and lets readers proceed while a worker holds the write lock
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            # only keep a connection once it is fully set up, so a failure here is retried
+            self._db = db
+        return self._db
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        with self._lock:
+            db = self._connect()
+            # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = db.execute(
+                    "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens = self.burst if row is None else min(
+                    self.burst, row[0] + (now - row[1]) * self.rate
+                )
+                wait = max(0.0, (1 - tokens) / self.rate)
+                if wait > max_wait:
+                    db.execute("ROLLBACK")
+                    return None
+                db.execute(
+                    "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens - 1, now)
+                )
+                db.execute("COMMIT")
+                return wait
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+
+class CircuitBreaker:
+    """Per-process breaker for one upstream endpoint: closed -> open -> half-open -> closed."""
+
+    def __init__(self, endpoint: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            # let exactly one call find out whether upstream has recovered
+            self._probing = True
+            return True
+        return False
+
+    def cancel(self) -> None:
+        """An allowed call never reached upstream; don't count it either way."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Circuit for %s closed", self.endpoint)
+            CIRCUIT_OPEN.labels(self.endpoint).set(0)
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                logger.warning("Circuit for %s opened after %d failures", self.endpoint, self.failures)
+            self.opened_at = time.monotonic()
+            self._probing = False
+            CIRCUIT_OPEN.labels(self.endpoint).set(1)
+
+
+class UpstreamGuard:
+    """Rate limit + per-endpoint circuit breakers around upstream calls.
+
+    `limiter=None` and `failure_threshold=0` make it a pass-through.
+    """
+
+    def __init__(self, limiter: Optional[TokenBucket] = None,
+                 failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT_MS / 1000):
+        self.limiter = limiter
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_wait = max_wait
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+        return self.breakers[endpoint]
+
+    async def call(self, endpoint: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            UPSTREAM_REJECTED.labels(endpoint, "circuit_open").inc()
+            raise UpstreamUnavailable(endpoint, "circuit open", breaker.retry_after())
+
+        if self.limiter is not None:
+            try:
+                wait = await asyncio.to_thread(self.limiter.reserve, self.max_wait)
+            except BaseException:
+                breaker.cancel()
+                raise
+            if wait is None:
+                breaker.cancel()
+                UPSTREAM_REJECTED.labels(endpoint, "rate_limited").inc()
+                raise UpstreamUnavailable(endpoint, "rate limited", 1 / self.limiter.rate)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        try:
+            response = await send()
+        except httpx.HTTPError:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.cancel()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def stats(self) -> Dict[str, str]:
+        return {endpoint: breaker.state for endpoint, breaker in self.breakers.items()}
+
+
+def create_openweather_guard() -> UpstreamGuard:
+    """The guard shared by every service calling OpenWeather with our API key."""
+    limiter = None
+    if OPENWEATHER_CALLS_PER_MINUTE > 0:
+        limiter = TokenBucket("openweather", OPENWEATHER_CALLS_PER_MINUTE / 60, OPENWEATHER_BURST)
+    return UpstreamGuard(limiter)
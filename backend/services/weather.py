@@ -1,32 +1,64 @@
 import os
-import requests
+import logging
+import httpx
 from fastapi import HTTPException
 from dotenv import load_dotenv
+from typing import Optional
+from services.http import OPENWEATHER_BASE_URL
+from services.cache import TTLCache, normalize_city
+from services.geocode import GeocodeService
+from services.logging_setup import log_payload
+from services.metrics import record_upstream_error, timed
+from services.upstream_guard import UpstreamGuard
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient, geocoder: GeocodeService,
+                 cache: Optional[TTLCache] = None, guard: Optional[UpstreamGuard] = None):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
         if not self.api_key:
             raise RuntimeError("Missing OPENWEATHER_API_KEY in .env")
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = f"{OPENWEATHER_BASE_URL}/data/2.5"
+        self.client = client
+        self.geocoder = geocoder
+        self.cache = cache
+        self.guard = guard or UpstreamGuard(failure_threshold=0)
         
-        # Debug: Verify key is loaded (prints first 5 chars for security)
-        print(f"Weather API Key: {self.api_key[:5]}...")
+        # Verify key is loaded (logs first 5 chars for security)
+        logger.info("Weather API Key: %s...", self.api_key[:5])
 
-    def get_weather(self, city: str):
+    async def get_weather(self, city: str):
+        """Get current weather data, served from the TTL cache when configured"""
+        if self.cache is None:
+            return await self._fetch_weather(city)
+        return await self.cache.get_or_fetch(
+            normalize_city(city), lambda: self._fetch_weather(city)
+        )
+
+    async def refresh_weather(self, city: str):
+        """Re-fetch into the cache ahead of expiry (see services/prewarm.py)"""
+        if self.cache is None:
+            return await self._fetch_weather(city)
+        return await self.cache.refresh(normalize_city(city), lambda: self._fetch_weather(city))
+
+    async def _fetch_weather(self, city: str):
         """Get current weather data with comprehensive error handling"""
         try:
-            # 1. Build and log request URL (without exposing full key)
-            url = f"{self.base_url}/weather?q={city}&appid={self.api_key[:5]}...&units=metric"
-            print(f"\n[DEBUG] Weather API Request: {url.replace(self.api_key, '***')}")
+            # 1. Resolve coordinates once (shared with the AQI lookup)
+            lat, lon = await self.geocoder.resolve(city)
+            logger.debug("Weather API Request: lat=%s lon=%s", lat, lon)
             
-            # 2. Make the API request
-            response = requests.get(
-                f"{self.base_url}/weather?q={city}&appid={self.api_key}&units=metric",
-                timeout=10
-            )
+            # 2. Make the API request on the shared connection pool
+            with timed("weather"):
+                response = await self.guard.call("weather", lambda: self.client.get(
+                    f"{self.base_url}/weather",
+                    params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"},
+                    timeout=10
+                ))
+            if response.status_code != 200:
+                record_upstream_error("weather", response.status_code)
             
             # 3. Check for empty/invalid responses
             if not response.content:
@@ -38,7 +70,7 @@ class WeatherService:
             # 4. Parse JSON with validation
             try:
                 data = response.json()
-                print(f"[DEBUG] Raw API Response: {data}")  # Debug output
+                log_payload(logger, "Raw Weather API Response", data)
             except ValueError as e:
                 raise HTTPException(
                     status_code=502,
@@ -77,12 +109,16 @@ class WeatherService:
                 "wind_speed": data["wind"]["speed"]
             }
             
-        except requests.exceptions.Timeout:
+        except HTTPException:
+            raise
+        except httpx.TimeoutException:
+            record_upstream_error("weather", "timeout")
             raise HTTPException(
                 status_code=504,
                 detail="Weather API request timed out"
             )
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            record_upstream_error("weather", "connection_error")
             raise HTTPException(
                 status_code=502,
                 detail=f"Weather API connection failed: {str(e)}"
@@ -91,4 +127,4 @@ class WeatherService:
             raise HTTPException(
                 status_code=500,
                 detail=f"Unexpected error: {str(e)}"
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+
+from services.llm_scheduler import LLMOverloaded, LLMScheduler
+
+
+class LLMSchedulerTest(unittest.TestCase):
+    def test_slow_generation_does_not_strand_waiters(self):
+        # estimate follows the last generation exactly, so a slow one makes
+        # the first waiter's deadline look unreachable just as the slot frees
+        # up. The woken waiter is rejected and must pass the wakeup on, never
+        # leave the next waiter blocked while nothing is running.
+        scheduler = LLMScheduler(max_concurrency=1, initial_estimate=0.0, smoothing=1.0)
+        holding = threading.Event()
+        results = {}
+
+        def slow():
+            with scheduler.slot():
+                holding.set()
+                time.sleep(0.3)
+
+        def waiter(name, deadline):
+            try:
+                with scheduler.slot(deadline):
+                    results[name] = "ran"
+            except LLMOverloaded:
+                results[name] = "rejected"
+
+        threads = [threading.Thread(target=slow, daemon=True)]
+        threads[0].start()
+        holding.wait()
+        # woken first (Condition waiters are FIFO)
+        threads.append(threading.Thread(target=waiter, args=("deadline", time.monotonic() + 0.4), daemon=True))
+        threads[-1].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=waiter, args=("no_deadline", None), daemon=True))
+        threads[-1].start()
+
+        for thread in threads:
+            thread.join(timeout=2)
+        self.assertEqual(results, {"deadline": "rejected", "no_deadline": "ran"})
+        self.assertEqual(scheduler.stats()["active"], 0)
+        self.assertEqual(scheduler.stats()["waiting"], 0)
+
+    def test_expired_deadline_is_rejected_even_with_a_free_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1, initial_estimate=0.0)
+        with self.assertRaises(LLMOverloaded):
+            with scheduler.slot(deadline=time.monotonic() - 1):
+                pass
+        self.assertEqual(scheduler.stats()["active"], 0)
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+
+    def test_unreachable_deadline_is_rejected_even_with_a_free_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1, initial_estimate=10.0)
+        with self.assertRaises(LLMOverloaded):
+            with scheduler.slot(deadline=time.monotonic() + 1):
+                pass
+        self.assertEqual(scheduler.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from services import packing
+from services.llm_scheduler import LLMScheduler
+from services.packing_cache import PackingResultCache
+
+DOCUMENT = "For a city trip with mild weather and good air quality, pack: Light jacket, Umbrella."
+ANSWER = json.dumps({"packing_list": ["Light jacket"], "travel_tips": ["Carry an umbrella"]})
+
+
+class PackingBatchDeadlineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.generation_seconds = 0.3
+        patches = [
+            mock.patch.object(packing, "packing_cache",
+                              PackingResultCache(db_path=os.path.join(tmp.name, "cache.sqlite3"))),
+            mock.patch.object(packing, "llm_scheduler",
+                              LLMScheduler(max_concurrency=2, initial_estimate=self.generation_seconds)),
+            mock.patch.object(packing, "initialize_packing_service"),
+            mock.patch.object(packing, "_retrieve_documents", side_effect=lambda trips: [DOCUMENT] * len(trips)),
+            mock.patch.object(packing, "_chat", side_effect=self.slow_chat),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def slow_chat(self, messages, stream=False):
+        time.sleep(self.generation_seconds)
+        return {"message": {"content": ANSWER}}
+
+    def test_items_that_cannot_finish_in_time_degrade(self):
+        trips = [(f"City {i}", 18.0, 2) for i in range(8)]
+        start = time.monotonic()
+        results = packing.get_packing_suggestions_batch(trips, deadline=start + 0.4)
+        elapsed = time.monotonic() - start
+
+        sources = [result["source"] for result in results]
+        # the first wave fits the deadline; nothing is generated after it would be missed
+        self.assertEqual(sources.count(packing.AI_SOURCE), 2)
+        self.assertTrue(all(result["packing_list"] for result in results))
+        self.assertLess(elapsed, 2 * self.generation_seconds)
+
+    def test_results_keep_input_order(self):
+        trips = [(f"City {i}", 18.0, 2) for i in range(3)]
+        packing.packing_cache.set("City 1", 18.0, 2, {"packing_list": ["Cached"], "travel_tips": [],
+                                                       "source": packing.AI_SOURCE})
+        results = packing.get_packing_suggestions_batch(trips)
+        self.assertEqual([r["packing_list"] for r in results],
+                         [["Light jacket"], ["Cached"], ["Light jacket"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import unittest
+
+from services.packing_parser import PackingStreamParser, parse_packing_response
+
+
+class ParsePackingResponseTest(unittest.TestCase):
+    def test_inline_numbered_tips_are_split(self):
+        parsed = parse_packing_response("1. Umbrella\n2. Boots\n\nTravel Tips: 1. Stay dry 2. Eat well")
+        self.assertEqual(parsed["packing_list"], ["Umbrella", "Boots"])
+        self.assertEqual(parsed["travel_tips"], ["Stay dry", "Eat well"])
+
+    def test_inline_numbered_items_are_split(self):
+        parsed = parse_packing_response("Packing List: 1. Hat 2. Sunscreen 3. Water bottle")
+        self.assertEqual(parsed["packing_list"], ["Hat", "Sunscreen", "Water bottle"])
+
+    def test_inline_items_are_split_when_streamed_in_pieces(self):
+        parser = PackingStreamParser()
+        text = "Travel Tips: 1. Stay dry 2. Eat well"
+        events = [e for i in range(0, len(text), 4) for e in parser.feed(text[i:i + 4])]
+        events += parser.finish()
+        self.assertEqual([e["text"] for e in events], ["Stay dry", "Eat well"])
+
+    def test_string_instead_of_array_is_one_item(self):
+        parsed = parse_packing_response(json.dumps({"packing_list": "Raincoat", "travel_tips": ["Stay dry"]}))
+        self.assertEqual(parsed["packing_list"], ["Raincoat"])
+        self.assertEqual(parsed["travel_tips"], ["Stay dry"])
+
+    def test_truncated_json_keeps_completed_items(self):
+        parsed = parse_packing_response('{"packing_list": ["Hat", "Sunscr')
+        self.assertEqual(parsed["packing_list"], ["Hat"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from services.cache import TTLCache
+from services.prewarm import RefreshScheduler
+from services.prewarm_store import PrewarmStore
+
+
+class FakeService:
+    """Weather/AQI service stand-in: counts upstream refreshes."""
+
+    def __init__(self, value):
+        self.cache = TTLCache(ttl=600)
+        self.guard = SimpleNamespace(breaker=lambda endpoint: SimpleNamespace(state="closed"))
+        self.value = value
+        self.calls = []
+
+    async def refresh(self, city):
+        self.calls.append(city)
+        self.cache.set(city.lower(), self.value)
+        return self.value
+
+
+class PrewarmAcrossWorkersTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, "prewarm.sqlite3")
+        # packing precompute is not under test here
+        patch = mock.patch.object(RefreshScheduler, "_precompute_packing", mock.AsyncMock())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def worker(self, owner):
+        store = PrewarmStore(self.db_path)
+        store.owner = owner
+        weather, aqi = FakeService({"temp": 21.0}), FakeService({"aqi": 2})
+        weather.refresh_weather, aqi.refresh_aqi = weather.refresh, aqi.refresh
+        scheduler = RefreshScheduler(weather, aqi, min_requests=3, store=store)
+        return scheduler, weather, aqi
+
+    def test_counts_are_pooled_and_only_the_lease_holder_refreshes(self):
+        first, first_weather, _ = self.worker("worker-1")
+        second, second_weather, _ = self.worker("worker-2")
+        # neither worker alone has seen enough requests for Paris to be hot
+        for _ in range(2):
+            first.record("Paris")
+            second.record("Paris")
+
+        asyncio.run(second.tick())
+        self.assertEqual(second_weather.calls, [])
+        asyncio.run(first.tick())
+        asyncio.run(second.tick())
+        self.assertTrue(second.leader)
+        self.assertFalse(first.leader)
+        self.assertEqual(second_weather.calls, ["Paris"])
+        self.assertEqual(first_weather.calls, [])
+
+        # the holder's refreshed values reach the other worker's cache without an upstream call
+        asyncio.run(first.tick())
+        self.assertEqual(first_weather.cache.peek("paris"), {"temp": 21.0})
+        self.assertGreater(first_weather.cache.fresh_for("paris"), 0)
+        self.assertEqual(first_weather.calls, [])
+
+    def test_lease_moves_on_when_released(self):
+        first, _, _ = self.worker("worker-1")
+        second, _, _ = self.worker("worker-2")
+        asyncio.run(first.tick())
+        asyncio.run(second.tick())
+        self.assertTrue(first.leader)
+        self.assertFalse(second.leader)
+
+        asyncio.run(first.close())
+        asyncio.run(second.tick())
+        self.assertTrue(second.leader)
+
+    def test_tracked_cities_are_capped(self):
+        scheduler, _, _ = self.worker("worker-1")
+        scheduler.max_tracked = 3
+        for city in ["A", "B", "C", "D"]:
+            scheduler.record(city)
+        asyncio.run(scheduler.tick())
+        self.assertEqual(len(scheduler.store.hot(0, 10)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
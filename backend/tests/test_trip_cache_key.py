@@ -0,0 +1,21 @@
+import unittest
+
+from services.packing import packing_cache, trip_cache_city
+
+
+class TripCacheKeyTest(unittest.TestCase):
+    def key(self, temp_min, temp_max, temp_mean=2.0, aqi=2):
+        return packing_cache.key(trip_cache_city("Paris", temp_min, temp_max), temp_mean, aqi)
+
+    def test_negative_bands_do_not_collide_with_positive_ones(self):
+        width = packing_cache.band_width
+        # same mean band and AQI; only the sign of the lowest band differs
+        self.assertNotEqual(self.key(-width, 2 * width), self.key(width, 2 * width))
+        self.assertNotEqual(self.key(-width, -width), self.key(width, width))
+
+    def test_trips_do_not_collide_with_single_day_results(self):
+        self.assertNotEqual(self.key(0.0, 4.0), packing_cache.key("Paris", 2.0, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
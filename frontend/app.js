@@ -0,0 +1,181 @@
+// Canonical name of each city already searched this session, by what was typed
+const searchedCities = new Map();
+
+async function fetchData() {
+  const input = document.getElementById('cityInput').value.trim();
+  if (!input) {
+    showError("Please enter a city name");
+    return;
+  }
+  const known = searchedCities.get(input.toLowerCase());
+  if (known) {
+    // Repeat searches use the non-streaming endpoint, which the browser caches
+    // (max-age, then ETag revalidation) until the weather/AQI data goes stale
+    await fetchCachedGuide(known);
+    return;
+  }
+  let city = input;
+
+  try {
+    // Show loading state; sections are filled in as the stream arrives
+    document.getElementById('results').innerHTML = `
+      <div class="section" id="weatherSection">
+        <h3>Loading data for ${city}...</h3>
+      </div>
+      <div class="section" id="aqiSection"></div>
+      <div class="section" id="packingSection">
+        <h3>Packing Suggestions</h3>
+        <div class="packing-list">
+          <h3>Packing List:</h3>
+          <ul id="packingItems"><li>Generating...</li></ul>
+        </div>
+        <div class="travel-tips">
+          <ul id="travelTips"></ul>
+        </div>
+      </div>
+    `;
+
+    const response = await fetch(`/api/${encodeURIComponent(city)}/stream`);
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || "City not found or service error");
+    }
+
+    // Read newline-delimited JSON events as they arrive
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let firstItem = true;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+        if (event.type === 'error') {
+          throw new Error(event.detail || "City not found or service error");
+        } else if (event.type === 'city') {
+          city = event.name;
+          searchedCities.set(input.toLowerCase(), city);
+          searchedCities.set(city.toLowerCase(), city);
+        } else if (event.type === 'weather') {
+          displayWeather(city, event.data);
+        } else if (event.type === 'aqi') {
+          displayAqi(event.data);
+        } else if (event.type === 'packing_item') {
+          if (firstItem) {
+            document.getElementById('packingItems').innerHTML = '';
+            firstItem = false;
+          }
+          appendListItem('packingItems', event.text);
+        } else if (event.type === 'travel_tip') {
+          appendListItem('travelTips', event.text);
+        }
+      }
+    }
+
+  } catch (err) {
+    showError(err.message);
+  }
+}
+
+async function fetchCachedGuide(city) {
+  try {
+    document.getElementById('results').innerHTML = `
+      <div class="section" id="weatherSection">
+        <h3>Loading data for ${city}...</h3>
+      </div>
+    `;
+
+    const response = await fetch(`/api/${encodeURIComponent(city)}`);
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.detail || "City not found or service error");
+    }
+
+    document.getElementById('results').innerHTML = `
+      <div class="section" id="weatherSection"></div>
+      <div class="section" id="aqiSection"></div>
+      <div class="section" id="packingSection">
+        <h3>Packing Suggestions</h3>
+        <div class="packing-list">
+          <h3>Packing List:</h3>
+          <ul id="packingItems"></ul>
+        </div>
+        <div class="travel-tips">
+          <ul id="travelTips"></ul>
+        </div>
+      </div>
+    `;
+    displayWeather(data.city, data.weather);
+    displayAqi(data.aqi);
+    data.packing.packing_list.forEach(item => appendListItem('packingItems', item));
+    data.packing.travel_tips.forEach(tip => appendListItem('travelTips', tip));
+
+  } catch (err) {
+    showError(err.message);
+  }
+}
+
+function appendListItem(listId, text) {
+  const li = document.createElement('li');
+  li.textContent = text;
+  document.getElementById(listId).appendChild(li);
+}
+
+function displayWeather(city, weather) {
+  document.getElementById('weatherSection').innerHTML = `
+    <h3>Weather in ${city}</h3>
+    <p><span class="weather-highlight">Temperature:</span> ${weather.temp}°C (Feels like ${weather.feels_like}°C)</p>
+    <p><span class="weather-highlight">Conditions:</span> ${weather.description}</p>
+    <p><span class="weather-highlight">Humidity:</span> ${weather.humidity}%</p>
+    <p><span class="weather-highlight">Wind Speed:</span> ${weather.wind_speed} m/s</p>
+    ${weather.stale ? `<p class="stale">Live weather is unavailable; showing data from ${Math.round(weather.age_seconds / 60)} min ago</p>` : ''}
+  `;
+}
+
+function displayAqi(aqi) {
+  // Get AQI level and color
+  const aqiColor = getAqiColor(aqi.aqi);
+  document.getElementById('aqiSection').innerHTML = `
+    <h3>Air Quality Index</h3>
+    <p><span class="weather-highlight">AQI:</span> 
+      <span class="aqi-indicator" style="background-color: ${aqiColor}">
+        ${aqi.aqi} - ${aqi.level}
+      </span>
+    </p>
+    <p><span class="weather-highlight">Main Pollutants:</span> PM2.5: ${aqi.components.pm2_5} μg/m³, PM10: ${aqi.components.pm10} μg/m³</p>
+  `;
+}
+
+function showError(message) {
+  document.getElementById('results').innerHTML = `
+    <div class="error">
+      <h3>Error</h3>
+      <p>${message}</p>
+    </div>
+  `;
+}
+
+function getAqiColor(aqi) {
+  // AQI color scale (1-5)
+  const colors = {
+    1: '#00e400',  // Good
+    2: '#ffff00',  // Fair
+    3: '#ff7e00',  // Moderate
+    4: '#ff0000',  // Poor
+    5: '#8f3f97'   // Very Poor
+  };
+  return colors[aqi] || '#cccccc';
+}
+
+// Allow searching by pressing Enter key
+document.getElementById('cityInput').addEventListener('keypress', function(e) {
+  if (e.key === 'Enter') {
+    fetchData();
+  }
+});